@@ -0,0 +1,118 @@
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+PAGE_BREAK = "\f"
+MIN_DEDUPE_WORDS = 4
+_BULLET_PREFIX = re.compile("^[\u2022\u25cf\u25aa\u25a0\u25e6\u2023\u2219\u00b7\u25ba\u27a2\u2713\u2714\u2043*\u2013\u2014-]+\\s*")
+_INVISIBLE = re.compile("[\u00ad\u200b\u200c\u200d\u2060\ufeff]")
+_HORIZONTAL_SPACE = re.compile("[ \t\u00a0\u2000-\u200a\u202f\u205f\u3000]+")
+_RULE_LINE = re.compile(r"^[\W_]{3,}$")
+_PAGE_NUMBER = re.compile(r"^(?:page\s*)?#+(?:\s*(?:/|of)\s*#+)?$")
+_PAGE_COUNTER = re.compile(r"\bpage\b|\b\d+\s*(?:/|of)\s*\d+\s*$")
+_TOKEN_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+@lru_cache(maxsize=1)
+def _tiktoken_encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count from tiktoken when installed, otherwise a word/punctuation heuristic."""
+    if not text:
+        return 0
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Long words split into several BPE tokens; roughly one token per 4 letters, digits in groups of 3.
+    return sum(
+        max(1, (len(piece) + 3) // 4) if piece[0].isalpha() else max(1, (len(piece) + 2) // 3) if piece[0].isdigit() else 1
+        for piece in _TOKEN_PIECES.findall(text)
+    )
+
+
+def _page_key(line: str) -> str:
+    # Footers like "Jane Doe | Page 2 of 3" differ only by their page number, so those digits are folded together.
+    lowered = line.lower()
+    return re.sub(r"\d+", "#", lowered) if _PAGE_COUNTER.search(lowered) else lowered
+
+
+def normalize_line(line: str) -> str:
+    line = _INVISIBLE.sub("", unicodedata.normalize("NFKC", line))
+    line = _HORIZONTAL_SPACE.sub(" ", line).strip()
+    if _BULLET_PREFIX.match(line):
+        stripped = _BULLET_PREFIX.sub("", line)
+        line = f"- {stripped}" if stripped else ""
+    return "" if _RULE_LINE.match(line) else line
+
+
+def _split_pages(text: str) -> list[list[str]]:
+    return [[normalize_line(line) for line in re.split(r"\r\n|[\n\r]", page)] for page in text.split(PAGE_BREAK)]
+
+
+def _page_furniture(pages: list[list[str]], edge_lines: int = 2) -> tuple[set[str], list[set[int]]]:
+    """Keys of lines repeating at the top or bottom of most pages, and each page's edge line positions."""
+    edges: list[set[int]] = []
+    counts: Counter[str] = Counter()
+    for page in pages:
+        content = [index for index, line in enumerate(page) if line]
+        page_edges = set(content[:edge_lines] + content[-edge_lines:])
+        edges.append(page_edges)
+        counts.update({_page_key(page[index]) for index in page_edges})
+    if len(pages) < 2:
+        return set(), edges
+    threshold = max(2, int(len(pages) * 0.6 + 0.5))
+    return {key for key, count in counts.items() if count >= threshold}, edges
+
+
+def compact_text(text: str, max_tokens: int | None = None) -> str:
+    """Normalize whitespace, drop page headers/footers and duplicate lines, then fit ``max_tokens``."""
+    pages = _split_pages(text or "")
+    # Single-page text (DOCX, TXT, older PDF extractions) has no page breaks; repeats there are caught by line dedupe.
+    furniture, edges = _page_furniture(pages)
+
+    kept: list[str] = []
+    seen: set[str] = set()
+    furniture_seen: set[str] = set()
+    for page, page_edges in zip(pages, edges):
+        for index, line in enumerate(page):
+            if not line:
+                if kept and kept[-1]:
+                    kept.append("")
+                continue
+            if _PAGE_NUMBER.match(re.sub(r"\d+", "#", line.lower())):
+                continue
+            key = _page_key(line)
+            if index in page_edges and key in furniture:
+                # The first header usually carries the candidate's name, so only repeats and page counters are dropped.
+                if key in furniture_seen or key != line.lower():
+                    continue
+                furniture_seen.add(key)
+            # Short lines such as dates or single skills legitimately repeat under different roles.
+            if len(line.split()) >= MIN_DEDUPE_WORDS:
+                dedupe_key = line.lower()
+                if dedupe_key in seen:
+                    continue
+                seen.add(dedupe_key)
+            kept.append(line)
+
+    compacted = "\n".join(kept).strip()
+    if max_tokens is None or estimate_tokens(compacted) <= max_tokens:
+        return compacted
+
+    budgeted: list[str] = []
+    used = 0
+    for line in compacted.split("\n"):
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        budgeted.append(line)
+        used += cost
+    return "\n".join(budgeted).strip()
@@ -0,0 +1,80 @@
+import re
+import zlib
+from functools import lru_cache
+from typing import Iterable, Sequence
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[.-][a-z0-9+#]+)*")
+STOP_WORDS = frozenset(
+    """
+    a an and are as at be been but by for from has have i in into is it its my of on or our that the their this to
+    was we were will with you your
+    """.split()
+)
+
+
+@lru_cache(maxsize=65536)
+def _bucket(term: str) -> int:
+    # crc32 is stable across processes, unlike hash(), so stored vectors stay comparable after a restart.
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in _TOKEN_PATTERN.findall((text or "").lower()) if token not in STOP_WORDS]
+
+
+class HashedTfidfEmbedder:
+    """Fixed-size document vectors from feature-hashed unigrams and bigrams.
+
+    Terms are hashed into ``dimension`` signed buckets, term counts are damped with
+    ``log1p`` (sublinear TF), skill vocabulary terms get an IDF-style boost over everyday
+    words, and rows are L2-normalized so a dot product is a cosine similarity.
+    """
+
+    def __init__(self, dimension: int = 256, boosted_terms: Iterable[str] = (), boost: float = 2.0) -> None:
+        self.dimension = max(16, dimension)
+        self.boosted_terms = frozenset(term.lower() for term in boosted_terms)
+        self.boost = boost
+
+    def _features(self, text: str) -> tuple[list[int], list[float]]:
+        tokens = tokenize(text)
+        terms = tokens + [f"{left} {right}" for left, right in zip(tokens, tokens[1:])]
+        buckets = [_bucket(term) for term in terms]
+        weights = [
+            (self.boost if term in self.boosted_terms else 1.0) * (1.0 if bucket & 0x80000000 else -1.0)
+            for term, bucket in zip(terms, buckets)
+        ]
+        return buckets, weights
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed many documents at once; returns a float32 array of shape (len(texts), dimension)."""
+        rows: list[np.ndarray] = []
+        columns: list[np.ndarray] = []
+        values: list[np.ndarray] = []
+        for row, text in enumerate(texts):
+            buckets, weights = self._features(text)
+            if not buckets:
+                continue
+            rows.append(np.full(len(buckets), row, dtype=np.int64))
+            columns.append(np.asarray(buckets, dtype=np.int64) % self.dimension)
+            values.append(np.asarray(weights, dtype=np.float32))
+
+        matrix = np.zeros(len(texts) * self.dimension, dtype=np.float32)
+        if rows:
+            flat_index = np.concatenate(rows) * self.dimension + np.concatenate(columns)
+            matrix = np.bincount(flat_index, weights=np.concatenate(values), minlength=matrix.size).astype(np.float32)
+        matrix = matrix.reshape(len(texts), self.dimension)
+
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_batch([text])[0]
+
+
+def vector_to_list(vector: np.ndarray, precision: int = 5) -> list[float]:
+    """Compact JSON form for the Analysis.embeddings column."""
+    return np.round(vector.astype(np.float64), precision).tolist()
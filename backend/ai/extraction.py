@@ -1,83 +1,245 @@
+import codecs
+import hashlib
+import io
+import json
 import os
 import tempfile
+import threading
 from pathlib import Path
-from urllib.request import Request, urlopen
+from typing import Iterable, Iterator
 
 from docx import Document as DocxDocument
-from PIL import Image
+
+from backend.ai.extraction_pool import ExtractionPool
+from backend.ai.ocr import ocr_engine, warm_ocr_engine
+from backend.database.config import get_settings
+from backend.services.http import PooledHTTPClient
+
+settings = get_settings()
+# Parsing and OCR run in worker processes; cheap text formats are decoded inline.
+extraction_pool = ExtractionPool(
+    processes=settings.extraction_processes,
+    timeout_seconds=settings.extraction_timeout_seconds,
+    memory_limit_mb=settings.extraction_memory_limit_mb,
+)
+# OCR gets workers of its own: easyocr's torch runtime reserves far more address space than it uses,
+# so it runs without the address-space cap that still bounds PDF and DOCX parsing.
+ocr_pool = ExtractionPool(
+    processes=settings.ocr_processes if settings.extraction_processes > 0 else 0,
+    timeout_seconds=settings.extraction_timeout_seconds,
+    memory_limit_mb=0,
+    warmup=warm_ocr_engine if settings.ocr_warmup else None,
+)
+
+
+def warm_up_extraction() -> None:
+    """Load OCR models ahead of the first image upload, in the OCR workers or in a background thread."""
+    if ocr_pool.inline:
+        threading.Thread(target=warm_ocr_engine, name="ocr-warmup", daemon=True).start()
+    else:
+        ocr_pool.start()
+
+
+TEXT_CHUNK_CHARS = 64 * 1024
+# Keeps connections to the blob host alive between document downloads.
+remote_http = PooledHTTPClient(headers={"User-Agent": "NebulaGlass-AI/1.0 document fetch"})
+
+
+class RemoteTextCache:
+    """Extracted text of remote files on disk, keyed by URL and validated with the server's ETag."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory) if directory else None
+
+    def _path(self, url: str) -> Path:
+        return self.directory / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    def get(self, url: str) -> dict | None:
+        if self.directory is None:
+            return None
+        try:
+            return json.loads(self._path(url).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, etag: str, text: str) -> None:
+        if self.directory is None or not etag:
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.directory, delete=False, suffix=".tmp") as handle:
+                json.dump({"etag": etag, "text": text}, handle)
+            Path(handle.name).replace(self._path(url))
+        except OSError:
+            pass
+
+
+remote_text_cache = RemoteTextCache(settings.remote_extraction_cache_dir)
+
+
+def _joined(segments: Iterable[str], separator: str) -> Iterator[str]:
+    for index, segment in enumerate(segments):
+        yield segment if index == 0 else separator + segment
 
 
 class TextExtractor:
     @staticmethod
-    def extract(file_path: str) -> str:
+    def extract(file_path: str, max_chars: int | None = None) -> str:
+        return TextExtractor.collect(TextExtractor.iter_text(file_path), max_chars)[0]
+
+    @staticmethod
+    def extract_bytes(file_bytes: bytes, file_name: str, max_chars: int | None = None) -> str:
+        """Extract from an in-memory upload without writing it to disk or fetching it back from storage."""
+        return TextExtractor.collect(TextExtractor.iter_bytes(file_bytes, file_name), max_chars)[0]
+
+    @staticmethod
+    def collect(pieces: Iterator[str], max_chars: int | None = None) -> tuple[str, bool]:
+        """Join extracted pieces, stopping once ``max_chars`` are collected; returns (text, complete)."""
+        collected: list[str] = []
+        size = 0
+        complete = True
+        try:
+            for piece in pieces:
+                collected.append(piece)
+                size += len(piece)
+                if max_chars is not None and size >= max_chars:
+                    # Peeking for more would parse the next page range, so stopping here counts as partial.
+                    complete = False
+                    break
+        finally:
+            close = getattr(pieces, "close", None)
+            if close:
+                close()
+        text = "".join(collected)
+        if max_chars is not None and len(text) > max_chars:
+            text, complete = text[:max_chars], False
+        return text.strip(), complete
+
+    @staticmethod
+    def iter_text(file_path: str) -> Iterator[str]:
+        """Lazily yield a document's text as pages, paragraphs or file chunks; joined, they form the full text."""
         if file_path.startswith("http://") or file_path.startswith("https://"):
             return TextExtractor._extract_remote(file_path)
-
         path = Path(file_path)
-        suffix = path.suffix.lower()
+        return TextExtractor._iter_source(path, path.suffix.lower())
+
+    @staticmethod
+    def iter_bytes(file_bytes: bytes, file_name: str) -> Iterator[str]:
+        return TextExtractor._iter_source(file_bytes, Path(file_name).suffix.lower())
 
+    @staticmethod
+    def _iter_source(source: Path | bytes, suffix: str) -> Iterator[str]:
         if suffix == ".pdf":
-            return TextExtractor._extract_pdf(path)
+            return _joined(TextExtractor._iter_pdf_pages(source if isinstance(source, bytes) else str(source)), "\f")
         if suffix == ".docx":
-            return TextExtractor._extract_docx(path)
+            return iter([extraction_pool.run(TextExtractor._extract_docx, source)])
         if suffix in {".txt", ".csv", ".rtf"}:
-            return path.read_text(encoding="utf-8", errors="ignore")
+            return TextExtractor._iter_plain_text(source, "utf-8")
         if suffix == ".doc":
             # Legacy .doc support: fallback to permissive text decode when dedicated parsers are unavailable.
-            return path.read_bytes().decode("latin-1", errors="ignore")
+            return TextExtractor._iter_plain_text(source, "latin-1")
         if suffix in {".png", ".jpg", ".jpeg"}:
-            return TextExtractor._extract_image(path)
+            return iter([ocr_pool.run(TextExtractor._extract_image, source)])
         raise ValueError("Unsupported file type")
 
     @staticmethod
-    def _extract_remote(file_url: str) -> str:
+    def _iter_plain_text(source: Path | bytes, encoding: str) -> Iterator[str]:
+        if isinstance(source, bytes):
+            chunks = (source[start : start + TEXT_CHUNK_CHARS] for start in range(0, len(source), TEXT_CHUNK_CHARS))
+            yield from codecs.iterdecode(chunks, encoding, errors="ignore")
+            return
+        with source.open("r", encoding=encoding, errors="ignore") as handle:
+            while chunk := handle.read(TEXT_CHUNK_CHARS):
+                yield chunk
+
+    @staticmethod
+    def _extract_remote(file_url: str) -> Iterator[str]:
+        """Download into memory over the pooled client and extract from the buffer, with no temp file.
+
+        With ``REMOTE_EXTRACTION_CACHE_DIR`` set, the request is conditional on the cached ETag and a
+        ``304`` replays the cached text instead of downloading and parsing the file again.
+        """
         suffix = Path(file_url.split("?", 1)[0]).suffix.lower()
         headers = {}
         blob_token = os.getenv("BLOB_READ_WRITE_TOKEN", "").strip()
         if ".private.blob.vercel-storage.com/" in file_url and blob_token:
             headers["Authorization"] = f"Bearer {blob_token}"
+        cached = remote_text_cache.get(file_url)
+        if cached:
+            headers["If-None-Match"] = cached["etag"]
+
+        response = remote_http.client().get(file_url, headers=headers, follow_redirects=True)
+        if cached and response.status_code == 304:
+            yield cached["text"]
+            return
+        response.raise_for_status()
 
-        request = Request(file_url, headers=headers)
-        with urlopen(request) as response:
-            file_bytes = response.read()
+        etag = response.headers.get("etag", "")
+        pieces: list[str] = []
+        for piece in TextExtractor._iter_source(response.content, suffix):
+            pieces.append(piece)
+            yield piece
+        # Reached only when the caller read the whole document, so partial reads are never cached.
+        remote_text_cache.put(file_url, etag, "".join(pieces))
+
+    @staticmethod
+    def _iter_pdf_pages(source: str | bytes) -> Iterator[str]:
+        """Pages in order: the first range alone, then the rest of a long PDF in waves of parallel page ranges.
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            temp_file.write(file_bytes)
-            temp_path = Path(temp_file.name)
+        Each wave holds one range per worker and is submitted only once the caller asks for more, so a
+        caller that stops at its character budget never pays for parsing the rest of the document.
+        """
+        pages_per_job = max(1, settings.extraction_pdf_pages_per_job)
+        page_count, pages = extraction_pool.run(TextExtractor._extract_pdf_pages, source, 0, pages_per_job)
+        yield from pages
+        if page_count <= pages_per_job:
+            return
 
+        spilled = None
+        if isinstance(source, bytes) and not extraction_pool.inline:
+            # Workers open one shared temp copy instead of every range job pickling the whole buffer.
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as handle:
+                handle.write(source)
+            spilled = source = handle.name
         try:
-            return TextExtractor.extract(str(temp_path))
+            wave_size = 1 if extraction_pool.inline else max(1, extraction_pool.processes)
+            starts = list(range(pages_per_job, page_count, pages_per_job))
+            for offset in range(0, len(starts), wave_size):
+                ranges = [(source, start, min(start + pages_per_job, page_count)) for start in starts[offset : offset + wave_size]]
+                for _, range_pages in extraction_pool.map(TextExtractor._extract_pdf_pages, ranges):
+                    yield from range_pages
         finally:
-            temp_path.unlink(missing_ok=True)
+            if spilled:
+                Path(spilled).unlink(missing_ok=True)
 
     @staticmethod
-    def _extract_pdf(path: Path) -> str:
-        lines: list[str] = []
+    def _extract_pdf_pages(source: str | bytes, start: int, stop: int) -> tuple[int, list[str]]:
+        """Runs in an extraction worker: the document's page count and the text of pages [start, stop)."""
         import fitz
 
-        with fitz.open(str(path)) as pdf:
-            for page in pdf:
-                lines.append(page.get_text("text") or "")
-        return "\n".join(lines).strip()
+        with (fitz.open(stream=source, filetype="pdf") if isinstance(source, bytes) else fitz.open(source)) as pdf:
+            return pdf.page_count, [pdf[index].get_text("text") or "" for index in range(start, min(stop, pdf.page_count))]
 
     @staticmethod
-    def _extract_docx(path: Path) -> str:
-        doc = DocxDocument(str(path))
+    def _extract_docx(source: Path | bytes) -> str:
+        doc = DocxDocument(io.BytesIO(source) if isinstance(source, bytes) else str(source))
         return "\n".join(p.text for p in doc.paragraphs).strip()
 
     @staticmethod
-    def _extract_image(path: Path) -> str:
-        try:
-            import easyocr
-
-            reader = easyocr.Reader(["en"], gpu=False)
-            result = reader.readtext(str(path), detail=0)
-            return " ".join(result).strip()
-        except Exception:
-            try:
-                import pytesseract
-
-                image = Image.open(path)
-                return pytesseract.image_to_string(image).strip()
-            except Exception:
-                return ""
+    def extract_images(sources: list[Path | bytes]) -> list[str]:
+        """OCR many images at once: one batch per OCR worker, results in input order."""
+        if not sources:
+            return []
+        workers = 1 if ocr_pool.inline else max(1, ocr_pool.processes)
+        size = -(-len(sources) // workers)
+        batches = [(sources[start : start + size],) for start in range(0, len(sources), size)]
+        return [text for batch in ocr_pool.map(TextExtractor._extract_image_batch, batches) for text in batch]
+
+    @staticmethod
+    def _extract_image(source: Path | bytes) -> str:
+        # Runs in an OCR worker, whose engine stays loaded between jobs.
+        return ocr_engine.read(source)
+
+    @staticmethod
+    def _extract_image_batch(sources: list[Path | bytes]) -> list[str]:
+        return ocr_engine.read_batch(sources)
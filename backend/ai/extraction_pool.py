@@ -0,0 +1,144 @@
+import logging
+import multiprocessing
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionError(ValueError):
+    """Extraction was stopped by the pool: it ran past its deadline or its worker died (usually the memory limit)."""
+
+
+def _init_worker(memory_limit_bytes: int, warmup: Callable[[], Any] | None) -> None:
+    if memory_limit_bytes > 0:
+        try:
+            import resource
+
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+        except (ImportError, ValueError, OSError):
+            # Not available on Windows, and some containers refuse to lower the limit.
+            pass
+    if warmup is not None:
+        try:
+            warmup()
+        except Exception:  # noqa: BLE001
+            logger.exception("Extraction worker warm-up failed")
+
+
+def _noop() -> None:
+    return None
+
+
+class ExtractionPool:
+    """Process pool that keeps PDF parsing and OCR off the web workers.
+
+    Each job runs under a wall-clock deadline and an address-space limit. A job that
+    overruns has its workers terminated and the pool is recreated; other callers whose jobs
+    were running in the killed pool resubmit them to the new one instead of failing.
+    With ``processes=0``, or where processes cannot be started (some serverless
+    runtimes), jobs run inline in the calling thread without those limits.
+    ``warmup`` runs once in each new worker, e.g. to load OCR models before the first job.
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        timeout_seconds: float,
+        memory_limit_mb: int,
+        warmup: Callable[[], Any] | None = None,
+    ) -> None:
+        self.processes = processes
+        self.warmup = warmup
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit_bytes = max(0, memory_limit_mb) * 1024 * 1024
+        self._executor: ProcessPoolExecutor | None = None
+        self._inline = processes <= 0
+        self._lock = threading.Lock()
+        # Pools killed because one caller's job overran; their other callers were not at fault.
+        self._terminated: weakref.WeakSet[ProcessPoolExecutor] = weakref.WeakSet()
+
+    def _pool(self) -> ProcessPoolExecutor | None:
+        with self._lock:
+            if self._executor is None and not self._inline:
+                try:
+                    # Spawn so workers never inherit the web process's threads, sockets or database engine.
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.processes,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(self.memory_limit_bytes, self.warmup),
+                    )
+                except (OSError, NotImplementedError) as exc:
+                    logger.warning("Extraction process pool unavailable, extracting inline: %s", exc)
+                    self._inline = True
+            return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor, terminate: bool) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        if terminate:
+            self._terminated.add(executor)
+            # ProcessPoolExecutor cannot cancel a running job, so its workers are killed outright.
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                if process.is_alive():
+                    process.terminate()
+        # Returns promptly: any workers left are terminated or idle.
+        executor.shutdown(wait=terminate, cancel_futures=True)
+
+    def map(self, fn: Callable[..., Any], jobs: Iterable[tuple]) -> list[Any]:
+        """Run ``fn(*args)`` for each args tuple in parallel; results come back in job order."""
+        jobs = list(jobs)
+        results: dict[int, Any] = {}
+        deadline = time.monotonic() + self.timeout_seconds
+        crashed = False
+        while True:
+            executor = self._pool()
+            if executor is None:
+                return [results[index] if index in results else fn(*args) for index, args in enumerate(jobs)]
+
+            try:
+                futures = {index: executor.submit(fn, *args) for index, args in enumerate(jobs) if index not in results}
+                for index, future in futures.items():
+                    results[index] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                return [results[index] for index in range(len(jobs))]
+            except FutureTimeoutError as exc:
+                self._discard(executor, terminate=True)
+                raise ExtractionError(f"Text extraction took longer than {self.timeout_seconds:g} seconds") from exc
+            except BrokenProcessPool as exc:
+                if executor in self._terminated:
+                    # Killed for another caller's overrun: run the unfinished jobs again in the fresh pool.
+                    continue
+                self._discard(executor, terminate=False)
+                # A worker died (usually the memory limit) and took the pool down with it. The job that
+                # killed it cannot be told apart from its neighbours, so everything unfinished gets one retry.
+                if crashed or time.monotonic() >= deadline:
+                    raise ExtractionError("Text extraction worker stopped unexpectedly; the file may be too large or malformed") from exc
+                crashed = True
+            except MemoryError as exc:
+                raise ExtractionError("Text extraction exceeded its memory limit") from exc
+
+    @property
+    def inline(self) -> bool:
+        return self._pool() is None
+
+    def start(self) -> None:
+        """Start every worker now, running ``warmup`` in each, without waiting for them."""
+        executor = self._pool()
+        if executor is not None:
+            for _ in range(self.processes):
+                executor.submit(_noop)
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return self.map(fn, [args])[0]
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,48 @@
+from typing import Iterable
+
+import numpy as np
+
+
+class RoleFitMatrix:
+    """Binary role x keyword matrix built once from profile_map.
+
+    Scoring a CV against every role is a matrix-vector product with the CV's keyword
+    presence vector instead of a Python loop over roles.
+    """
+
+    def __init__(self, profile_map: dict[str, list[str]]) -> None:
+        self.roles = list(profile_map)
+        self.terms = list(dict.fromkeys(kw for keywords in profile_map.values() for kw in keywords))
+        self.term_index = {term: index for index, term in enumerate(self.terms)}
+        self.matrix = np.zeros((len(self.roles), len(self.terms)), dtype=np.float32)
+        for row, keywords in enumerate(profile_map.values()):
+            self.matrix[row, [self.term_index[kw] for kw in keywords]] = 1.0
+        self.role_sizes = np.maximum(self.matrix.sum(axis=1), 1.0)
+
+    def presence(self, terms: Iterable[str]) -> np.ndarray:
+        vector = np.zeros(len(self.terms), dtype=np.float32)
+        indexes = [self.term_index[term] for term in terms if term in self.term_index]
+        vector[indexes] = 1.0
+        return vector
+
+    def raw_scores(
+        self,
+        cv_presence: np.ndarray,
+        skill_presence: np.ndarray | None = None,
+        target_presence: np.ndarray | None = None,
+        evidence_bonus: float = 0.0,
+    ) -> np.ndarray:
+        """The _career_insights weighting for every role at once."""
+        scores = 16 * (self.matrix @ cv_presence) + evidence_bonus
+        if skill_presence is not None:
+            scores += 6 * (self.matrix @ skill_presence)
+        if target_presence is not None:
+            scores += 11 * (self.matrix @ (cv_presence * target_presence)) + 5 * (self.matrix @ target_presence)
+        return scores
+
+    def calibrated_scores(self, cv_presence: np.ndarray) -> np.ndarray:
+        """0-100 fit per role: 60% absolute keyword coverage, 40% strength relative to the best role."""
+        matched = self.matrix @ cv_presence
+        best = float(matched.max()) if matched.size else 0.0
+        relative = matched / best if best > 0 else np.zeros_like(matched)
+        return np.rint(100 * (0.6 * matched / self.role_sizes + 0.4 * relative))
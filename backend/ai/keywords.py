@@ -0,0 +1,72 @@
+from collections import deque
+from typing import Iterable
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum()
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton that finds every vocabulary keyword in one pass over the text.
+
+    Matches respect word boundaries on alphanumeric keyword edges, so "ui" does not fire
+    inside "build". A trailing plural "s" is tolerated ("apis" still counts as "api").
+    """
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        self.keywords: list[str] = list(dict.fromkeys(kw.strip().lower() for kw in keywords if kw and kw.strip()))
+        self.vocabulary = frozenset(self.keywords)
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[int]] = [[]]
+
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(index)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def _bounded(self, text: str, keyword: str, start: int, end: int) -> bool:
+        if _is_word_char(keyword[0]) and start > 0 and _is_word_char(text[start - 1]):
+            return False
+        if not _is_word_char(keyword[-1]) or end >= len(text) or not _is_word_char(text[end]):
+            return True
+        return text[end] == "s" and keyword[-1].isalpha() and (end + 1 >= len(text) or not _is_word_char(text[end + 1]))
+
+    def find_all(self, text: str) -> dict[str, list[int]]:
+        """Return {keyword: [start offsets into text.lower()]} for every keyword found."""
+        content = text.lower()
+        hits: dict[str, list[int]] = {}
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+
+        for position, char in enumerate(content):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                keyword = self.keywords[index]
+                start = position - len(keyword) + 1
+                if self._bounded(content, keyword, start, position + 1):
+                    hits.setdefault(keyword, []).append(start)
+        return hits
@@ -0,0 +1,80 @@
+import io
+import logging
+import threading
+from pathlib import Path
+from typing import Sequence
+
+from PIL import Image
+
+from backend.database.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class OcrEngine:
+    """One easyocr reader per process, loaded on first use and shared by every image.
+
+    Loading the detection and recognition models takes seconds, so the reader is built
+    once under a lock and reused; a semaphore caps concurrent inference. When easyocr is
+    not installed or fails to load, images fall back to pytesseract.
+    """
+
+    def __init__(self, languages: Sequence[str] = ("en",), max_concurrency: int = 1) -> None:
+        self.languages = list(languages)
+        self._reader = None
+        self._unavailable = False
+        self._load_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+
+    def _easyocr_reader(self):
+        if self._reader is not None or self._unavailable:
+            return self._reader
+        with self._load_lock:
+            if self._reader is None and not self._unavailable:
+                try:
+                    import easyocr
+
+                    self._reader = easyocr.Reader(self.languages, gpu=False)
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("easyocr unavailable, using pytesseract for images: %s", exc)
+                    self._unavailable = True
+        return self._reader
+
+    def warm(self) -> bool:
+        return self._easyocr_reader() is not None
+
+    def read(self, source: Path | bytes) -> str:
+        return self.read_batch([source])[0]
+
+    def read_batch(self, sources: Sequence[Path | bytes]) -> list[str]:
+        """OCR several images with a single slot, so one batch does not interleave with other callers."""
+        reader = self._easyocr_reader()
+        with self._slots:
+            return [self._read_one(reader, source) for source in sources]
+
+    @staticmethod
+    def _read_one(reader, source: Path | bytes) -> str:
+        if reader is not None:
+            try:
+                result = reader.readtext(source if isinstance(source, bytes) else str(source), detail=0)
+                return " ".join(result).strip()
+            except Exception:  # noqa: BLE001
+                pass
+        try:
+            import pytesseract
+
+            image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+            return pytesseract.image_to_string(image).strip()
+        except Exception:  # noqa: BLE001
+            return ""
+
+
+settings = get_settings()
+ocr_engine = OcrEngine(
+    languages=[language.strip() for language in settings.ocr_languages.split(",") if language.strip()] or ["en"],
+    max_concurrency=settings.ocr_max_concurrency,
+)
+
+
+def warm_ocr_engine() -> None:
+    ocr_engine.warm()
@@ -1,12 +1,41 @@
-from typing import Any
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable
+import hashlib
 import json
 import os
 import re
-from urllib.parse import quote
-from urllib.request import Request, urlopen
+import time
 
+import numpy as np
+
+from backend.ai.compaction import compact_text, estimate_tokens
+from backend.ai.embeddings import HashedTfidfEmbedder, vector_to_list
+from backend.ai.fit_matrix import RoleFitMatrix
+from backend.ai.keywords import KeywordAutomaton
+from backend.ai.research import RoleResearchCache
+from backend.ai.retrieval import ChunkIndexCache, select_excerpts, select_insights
+from backend.ai.signals import SOFT_SIGNAL_WORDS, CVFeatures, CVScanner
 from backend.database.config import get_settings
+from backend.services.http import PooledHTTPClient
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+OPENROUTER_COMPLETIONS_PATH = "/chat/completions"
+# Bump whenever the analysis prompt or result shape changes so cached results are not reused.
+ANALYSIS_PROMPT_VERSION = "3"
+ANALYSIS_PROVIDERS = ("openrouter", "local", "auto", "hedged")
+REQUIREMENT_STOP_WORDS = {
+    "and", "or", "and/or", "the", "for", "with", "from", "your", "role", "job", "that", "this", "have", "will", "using", "into", "are", "to", "of", "in", "on", "at", "as", "etc",
+    "junior", "senior", "mid", "entry", "level", "developer",
+}
+SHORT_REQUIREMENT_TERMS = {"sql", "api", "aws", "gcp", "c++", "c#", "ui", "ux"}
+QUESTION_SYSTEM_PROMPT = "You are an expert CV coach and job-fit analyst. Return only the answer text."
+
 
+@lru_cache(maxsize=32)
+def _compact_for_analysis(text: str, max_tokens: int) -> str:
+    # The cache key and the analysis both compact the same text, so repeat calls are served from here.
+    return compact_text(text, max_tokens)
 
 
 class AIPipeline:
@@ -28,6 +57,21 @@ class AIPipeline:
             or os.getenv("OPENAI_MODEL")
             or "openai/gpt-4o-mini"
         ).strip()
+        self.analysis_provider = (settings.analysis_provider or "openrouter").strip().lower()
+        self.hedge_deadline_seconds = settings.analysis_hedge_deadline_seconds
+        self._hedge_executor = ThreadPoolExecutor(max_workers=max(1, settings.http_pool_size), thread_name_prefix="analysis-hedge")
+        self.http = PooledHTTPClient(base_url=OPENROUTER_BASE_URL)
+        self.role_research = RoleResearchCache(
+            ttl_seconds=settings.role_research_ttl_seconds,
+            deadline_seconds=settings.role_research_deadline_seconds,
+            live_lookup=settings.role_research_live_lookup,
+        )
+        if settings.role_research_snapshot_path:
+            try:
+                loaded = self.role_research.load_snapshot(settings.role_research_snapshot_path)
+                print(f"[startup] Loaded role research for {loaded} job titles")
+            except (OSError, ValueError) as exc:
+                print(f"[startup] Role research snapshot could not be loaded: {exc}")
         self.profile_map: dict[str, list[str]] = {
             # Technology & Software
             "Software Engineer": ["python", "java", "javascript", "react", "node", "api", "git", "c++", "software", "backend", "frontend"],
@@ -194,18 +238,196 @@ class AIPipeline:
             },
         }
 
-    def analyze(self, text: str, profile_context: dict[str, str] | None = None) -> dict[str, Any]:
-        trimmed = (text or "")[:9000]
+        # Compiled once so role scoring, classification and evidence lookup share the same keyword hits.
+        study_vocabulary = [
+            part
+            for items in self.study_recommendations.values()
+            for item in items
+            for part in [item, *re.split(r"[/&]", item)]
+        ]
+        self.keyword_automaton = KeywordAutomaton(
+            [kw for keywords in self.profile_map.values() for kw in keywords] + study_vocabulary
+        )
+        self.cv_scanner = CVScanner(self.keyword_automaton)
+        self.role_matrix = RoleFitMatrix(self.profile_map)
+        self.analysis_max_input_tokens = settings.analysis_max_input_tokens
+        self.chunk_indexes = ChunkIndexCache(settings.qa_chunk_cache_entries, prepare=compact_text)
+        self.qa_context_token_budget = settings.qa_context_token_budget
+        self.embedder = HashedTfidfEmbedder(settings.embedding_dimension, boosted_terms=self.keyword_automaton.keywords)
+
+    def analyze(
+        self,
+        text: str,
+        profile_context: dict[str, str] | None = None,
+        on_stage: Callable[[str], None] | None = None,
+        provider: str | None = None,
+    ) -> dict[str, Any]:
+        trimmed = self.compact(text)
         if not trimmed.strip():
             raise RuntimeError("The uploaded CV could not be read clearly enough for OpenRouter analysis.")
 
-        return self._analyze_with_openrouter(trimmed, profile_context or {})
+        provider = self.resolve_provider(provider)
+        if provider == "local":
+            return self._analyze_locally(trimmed, profile_context or {})
+        if provider == "hedged":
+            # A hedged result may be provisional; only analyze_hedged hands back the pending OpenRouter result to upgrade it.
+            raise RuntimeError("The hedged provider must go through analyze_hedged so its provisional result can be upgraded.")
+        if provider == "auto":
+            try:
+                return self._analyze_with_openrouter(trimmed, profile_context or {}, on_stage=on_stage)
+            except RuntimeError:
+                return self._analyze_locally(trimmed, profile_context or {})
+        return self._analyze_with_openrouter(trimmed, profile_context or {}, on_stage=on_stage)
 
-    def _call_openrouter(self, system_prompt: str, user_prompt: str, temperature: float = 0.4) -> str:
+    def analyze_hedged(
+        self,
+        text: str,
+        profile_context: dict[str, str] | None = None,
+        deadline_seconds: float | None = None,
+    ) -> tuple[dict[str, Any], Future | None]:
+        """Race OpenRouter against the local scorer.
+
+        Returns the OpenRouter result if it lands within the deadline. Otherwise returns the local
+        result marked ``local-provisional`` together with the still-running OpenRouter future.
+        """
+        trimmed = self.compact(text)
+        if not trimmed.strip():
+            raise RuntimeError("The uploaded CV could not be read clearly enough for OpenRouter analysis.")
+
+        started = time.monotonic()
+        deadline = self.hedge_deadline_seconds if deadline_seconds is None else deadline_seconds
+        pending = self._hedge_executor.submit(self._analyze_with_openrouter, trimmed, profile_context or {})
+        local_result = self._analyze_locally(trimmed, profile_context or {})
+
+        try:
+            return pending.result(timeout=max(0.0, deadline - (time.monotonic() - started))), None
+        except FutureTimeoutError:
+            local_result["insights"]["analysis_provider"] = "local-provisional"
+            return local_result, pending
+        except Exception:  # noqa: BLE001
+            # The local result is already computed, so any OpenRouter failure falls back to it.
+            return local_result, None
+
+    def compact(self, text: str) -> str:
+        """CV text as sent to every analysis engine: cleaned, deduplicated and fitted to the token budget."""
+        return _compact_for_analysis(text or "", self.analysis_max_input_tokens)
+
+    def role_fit_landscape(self, text: str) -> list[dict[str, Any]]:
+        """Calibrated fit of one CV against every role in profile_map, best first."""
+        features = self.cv_scanner.scan(self.compact(text))
+        cv_presence = self.role_matrix.presence(features.keyword_hits)
+        scores = self.role_matrix.calibrated_scores(cv_presence)
+        matched_counts = self.role_matrix.matrix @ cv_presence
+
+        landscape: list[dict[str, Any]] = []
+        for row in np.argsort(-scores, kind="stable"):
+            role = self.role_matrix.roles[row]
+            keywords = self.profile_map[role]
+            landscape.append(
+                {
+                    "name": role,
+                    "score": int(scores[row]),
+                    "coverage_percent": int(round(100 * matched_counts[row] / self.role_matrix.role_sizes[row])),
+                    "matched_keywords": [kw for kw in keywords if kw in features.keyword_hits],
+                    "missing_keywords": [kw for kw in keywords if kw not in features.keyword_hits][:5],
+                }
+            )
+        return landscape
+
+    def rank_candidates(self, texts: list[str], job_title: str, job_description: str) -> list[dict[str, Any]]:
+        """Score many CVs against one job description; returns one entry per text, in input order.
+
+        Requirement terms are parsed once into their own automaton. Each CV contributes a row
+        to a term-presence matrix, and scoring is one matrix-vector product with the term
+        weights plus capped evidence bonuses from the CV signals.
+        """
+        terms = self._requirement_terms(job_title, job_description)
+        if not terms:
+            raise RuntimeError("The job description has no requirement terms to rank against.")
+
+        automaton = KeywordAutomaton(terms)
+        title_terms = set(self._requirement_terms(job_title))
+        # Known skills and title words matter more than generic requirement prose.
+        weights = np.array(
+            [(2.0 if term in self.keyword_automaton.vocabulary else 1.0) + (1.0 if term in title_terms else 0.0) for term in automaton.keywords],
+            dtype=np.float32,
+        )
+        presence = np.zeros((len(texts), len(automaton.keywords)), dtype=np.float32)
+        evidence = np.zeros((len(texts), 3), dtype=np.float32)
+        term_index = {term: index for index, term in enumerate(automaton.keywords)}
+
+        for row, text in enumerate(texts):
+            compacted = self.compact(text)
+            features = self.cv_scanner.scan(compacted)
+            presence[row, [term_index[term] for term in automaton.find_all(compacted)]] = 1.0
+            evidence[row] = (
+                len(features.impact_hits),
+                len(features.achievement_lines),
+                max(features.years_found) if features.years_found else 0,
+            )
+
+        coverage = presence @ weights / float(weights.sum())
+        bonus = np.minimum(10, evidence[:, 0] * 2) + np.minimum(6, evidence[:, 1] * 2) + np.minimum(4, evidence[:, 2])
+        scores = np.rint(80 * coverage + bonus)
+
+        ranked: list[dict[str, Any]] = []
+        for row in range(len(texts)):
+            matched = presence[row].astype(bool)
+            ranked.append(
+                {
+                    "score": int(scores[row]),
+                    "requirement_coverage_percent": int(round(100 * coverage[row])),
+                    "matched_terms": [term for term, hit in zip(automaton.keywords, matched) if hit][:10],
+                    "missing_terms": [term for term, hit in zip(automaton.keywords, matched) if not hit][:10],
+                    "quantified_impact_count": int(evidence[row, 0]),
+                    "achievement_evidence_count": int(evidence[row, 1]),
+                    "years_experience": int(evidence[row, 2]),
+                }
+            )
+        return ranked
+
+    def embed_document(self, text: str) -> list[float]:
+        return vector_to_list(self.embedder.embed(text))
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [vector_to_list(vector) for vector in self.embedder.embed_batch(texts)]
+
+    def resolve_provider(self, provider: str | None = None) -> str:
+        resolved = (provider or self.analysis_provider or "openrouter").strip().lower()
+        if resolved not in ANALYSIS_PROVIDERS:
+            raise RuntimeError(f"Unknown analysis provider '{resolved}'. Use one of: {', '.join(ANALYSIS_PROVIDERS)}.")
+        return resolved
+
+    def analysis_cache_key(self, text: str, profile_context: dict[str, str] | None = None, provider: str | None = None) -> str:
+        provider = self.resolve_provider(provider)
+        normalized_context = {
+            key: " ".join(str(value).lower().split())
+            for key, value in sorted((profile_context or {}).items())
+            if str(value or "").strip()
+        }
+        payload = json.dumps(
+            {
+                "text": self.compact(text),
+                "profile_context": normalized_context,
+                # A hedged run is upgraded to the OpenRouter result, so both share one cache entry.
+                "provider": "openrouter" if provider == "hedged" else provider,
+                "model": "local" if provider == "local" else self.openrouter_model,
+                # Local insights change once research for the target role lands in the cache.
+                "research": bool(provider == "local" and self._cached_research_available(profile_context or {})),
+                "prompt_version": ANALYSIS_PROMPT_VERSION,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def ensure_openrouter_configured(self) -> None:
         if not self.openrouter_api_key:
             raise RuntimeError("OpenRouter is not configured on the backend.")
 
-        payload = {
+    def _openrouter_payload(self, system_prompt: str, user_prompt: str, temperature: float) -> dict[str, Any]:
+        self.ensure_openrouter_configured()
+
+        return {
             "model": self.openrouter_model,
             "temperature": temperature,
             "messages": [
@@ -214,29 +436,72 @@ class AIPipeline:
             ],
         }
 
-        request = Request(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            data=json.dumps(payload).encode("utf-8"),
-            headers={
-                "Authorization": f"Bearer {self.openrouter_api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "https://orbit-intel-ai.local",
-                "X-Title": "Orbit Intel AI",
-            },
-            method="POST",
-        )
+    def _openrouter_headers(self) -> dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.openrouter_api_key}",
+            "HTTP-Referer": "https://orbit-intel-ai.local",
+            "X-Title": "Orbit Intel AI",
+        }
+
+    def _completion_content(self, data: dict[str, Any]) -> str:
+        choices = data.get("choices") or []
+        if not choices:
+            raise RuntimeError("OpenRouter returned no choices.")
+        message = choices[0].get("message") or {}
+        content = (message.get("content") or "").strip()
+        if not content:
+            raise RuntimeError("OpenRouter returned an empty response.")
+        return content
+
+    def _call_openrouter(self, system_prompt: str, user_prompt: str, temperature: float = 0.4) -> str:
+        payload = self._openrouter_payload(system_prompt, user_prompt, temperature)
 
         try:
-            with urlopen(request, timeout=12) as response:  # noqa: S310
-                data = json.loads(response.read().decode("utf-8"))
-            choices = data.get("choices") or []
-            if not choices:
-                raise RuntimeError("OpenRouter returned no choices.")
-            message = choices[0].get("message") or {}
-            content = (message.get("content") or "").strip()
-            if not content:
-                raise RuntimeError("OpenRouter returned an empty response.")
-            return content
+            response = self.http.client().post(OPENROUTER_COMPLETIONS_PATH, json=payload, headers=self._openrouter_headers())
+            response.raise_for_status()
+            return self._completion_content(response.json())
+        except RuntimeError:
+            raise
+        except Exception as exc:
+            raise RuntimeError(f"OpenRouter request failed: {exc}") from exc
+
+    async def _acall_openrouter(self, system_prompt: str, user_prompt: str, temperature: float = 0.4) -> str:
+        payload = self._openrouter_payload(system_prompt, user_prompt, temperature)
+
+        try:
+            response = await self.http.async_client().post(OPENROUTER_COMPLETIONS_PATH, json=payload, headers=self._openrouter_headers())
+            response.raise_for_status()
+            return self._completion_content(response.json())
+        except RuntimeError:
+            raise
+        except Exception as exc:
+            raise RuntimeError(f"OpenRouter request failed: {exc}") from exc
+
+    async def _astream_openrouter(self, system_prompt: str, user_prompt: str, temperature: float = 0.4) -> AsyncIterator[str]:
+        payload = {**self._openrouter_payload(system_prompt, user_prompt, temperature), "stream": True}
+
+        try:
+            async with self.http.async_client().stream(
+                "POST",
+                OPENROUTER_COMPLETIONS_PATH,
+                json=payload,
+                headers=self._openrouter_headers(),
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    # OpenRouter interleaves ": OPENROUTER PROCESSING" comments with the data events.
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        return
+                    chunk = json.loads(data)
+                    if chunk.get("error"):
+                        raise RuntimeError(f"OpenRouter stream failed: {chunk['error']}")
+                    choices = chunk.get("choices") or []
+                    delta = ((choices[0].get("delta") or {}).get("content") or "") if choices else ""
+                    if delta:
+                        yield delta
         except RuntimeError:
             raise
         except Exception as exc:
@@ -262,7 +527,12 @@ class AIPipeline:
             except json.JSONDecodeError as exc:
                 raise RuntimeError("OpenRouter returned malformed JSON.") from exc
 
-    def _analyze_with_openrouter(self, cv_text: str, profile_context: dict[str, str]) -> dict[str, Any]:
+    def _analyze_with_openrouter(
+        self,
+        cv_text: str,
+        profile_context: dict[str, str],
+        on_stage: Callable[[str], None] | None = None,
+    ) -> dict[str, Any]:
         skills = (profile_context.get("skills") or "").strip()
         target_job_title = (profile_context.get("target_job_title") or "").strip()
         target_job_description = (profile_context.get("target_job_description") or "").strip()
@@ -290,9 +560,11 @@ class AIPipeline:
             f"Skills & Expertise: {skills or 'Not provided'}\n"
             f"Target Job Title: {target_job_title or 'Not provided'}\n"
             f"Target Job Description: {target_job_description or 'Not provided'}\n"
-            f"Uploaded CV Text:\n{cv_text[:8000]}"
+            f"Uploaded CV Text:\n{cv_text}"
         )
 
+        if on_stage:
+            on_stage("calling_model")
         raw = self._call_openrouter(
             system_prompt=(
                 "You are an expert CV and career-fit analyst. "
@@ -301,8 +573,19 @@ class AIPipeline:
             user_prompt=prompt,
             temperature=0.2,
         )
+        if on_stage:
+            on_stage("parsing")
         result = self._parse_json_response(raw)
+        try:
+            return self._normalize_openrouter_analysis(result, cv_text, target_job_title)
+        except RuntimeError:
+            raise
+        except Exception as exc:
+            # Malformed fields ("85%" as a percentage, a string for a list) surface as the same error as a failed
+            # request, so "auto" and "hedged" fall back to the local result instead of failing the request.
+            raise RuntimeError(f"OpenRouter analysis could not be read: {exc}") from exc
 
+    def _normalize_openrouter_analysis(self, result: dict[str, Any], cv_text: str, target_job_title: str) -> dict[str, Any]:
         entities_raw = result.get("entities") if isinstance(result.get("entities"), list) else []
         entities = [
             {
@@ -366,7 +649,73 @@ class AIPipeline:
             "summary": summary,
             "classification": classification,
             "entities": entities,
-            "embeddings": [],
+            "embeddings": self.embed_document(cv_text),
+            "insights": insights,
+        }
+
+    def _analyze_locally(self, cv_text: str, profile_context: dict[str, str]) -> dict[str, Any]:
+        features = self.cv_scanner.scan(cv_text)
+        # Only research already in the cache is used, so the local engine never waits on the network.
+        research = self._research_target_role(profile_context, cached_only=True)
+        career = self._career_insights(cv_text, profile_context, research=research, features=features)
+        entities = self._entities(cv_text)
+
+        target_job_title = (profile_context.get("target_job_title") or "").strip()
+        target_profile = next((name for name in self.profile_map if name.lower() == target_job_title.lower()), "")
+        focus_role = target_profile or (career.get("recommended_professions") or [""])[0]
+        missing_requirements = career.get("missing_requirements", [])
+        role_gaps = [kw for kw in self.profile_map.get(focus_role, []) if kw not in features.keyword_hits]
+
+        covered_terms = set(features.keyword_hits)
+        study_plan = [
+            item
+            for item in self.study_recommendations.get(focus_role, [])
+            if not any(part.strip().lower() in covered_terms for part in [item, *re.split(r"[/&]", item)])
+        ][:6]
+
+        ats_keywords = list(dict.fromkeys(missing_requirements + role_gaps))[:10]
+        exact_cv_additions = [
+            f"Used {keyword} to deliver <project or outcome>, improving <metric> by <X>%"
+            for keyword in ats_keywords[:3]
+        ]
+        if not features.impact_hits:
+            exact_cv_additions.append("Reduced <process> time from <X> to <Y> by <change you made>")
+
+        hard_skills = self.role_requirements.get(focus_role, {}).get("hard", []) if focus_role else []
+        project_stack = [kw for kw in hard_skills if kw not in covered_terms][:3] or role_gaps[:3]
+        project_suggestions = (
+            [f"Build a {focus_role} portfolio project using {', '.join(project_stack)} and report measurable results"]
+            if focus_role and project_stack
+            else ["Publish one end-to-end project that mirrors the target role and quantify its outcome"]
+        )
+
+        insights = {
+            "analysis_provider": "local",
+            "word_count": len(cv_text.split()),
+            "entity_count": len(entities),
+            "target_job_title": career.get("target_job_title") or target_job_title,
+            "target_fit_percent": career.get("target_fit_percent", 0),
+            "target_alignment": career.get("target_alignment", ""),
+            "matched_requirements": career.get("matched_requirements", []),
+            "missing_requirements": missing_requirements,
+            "cv_strengths_for_target": career.get("cv_strengths_for_target", []),
+            "cv_gaps_for_target": career.get("cv_gaps_for_target", []),
+            "recommended_professions": career.get("recommended_professions", []),
+            "profession_scores": career.get("profession_scores", []),
+            "alternative_role": career.get("alternative_role", ""),
+            "evidence_lines": career.get("evidence_lines", []),
+            "study_plan": study_plan,
+            "cv_improvement_priorities": self._improvement_steps(career),
+            "exact_cv_additions": exact_cv_additions,
+            "ats_keywords_to_add": ats_keywords,
+            "project_suggestions": project_suggestions,
+        }
+
+        return {
+            "summary": self._compose_career_summary(career, profile_context, research=research),
+            "classification": self._classify(cv_text, features),
+            "entities": entities,
+            "embeddings": self.embed_document(cv_text),
             "insights": insights,
         }
 
@@ -394,9 +743,10 @@ class AIPipeline:
             temperature=0.25,
         )
 
-    def _classify(self, text: str) -> str:
+    def _classify(self, text: str, features: CVFeatures | None = None) -> str:
         content = text.lower()
-        role_hits = sum(1 for keywords in self.profile_map.values() for kw in keywords if kw in content)
+        keyword_hits = (self.cv_scanner.scan(text) if features is None else features).keyword_hits
+        role_hits = sum(1 for keywords in self.profile_map.values() for kw in keywords if kw in keyword_hits)
         if role_hits >= 3 or "curriculum vitae" in content or "resume" in content:
             return "CV"
         if "invoice" in content:
@@ -421,7 +771,12 @@ class AIPipeline:
                 entities.append({"text": matched, "type": entity_type, "score": 0.95})
         return entities
 
-    def _research_target_role(self, profile_context: dict[str, str]) -> dict[str, Any]:
+    def _cached_research_available(self, profile_context: dict[str, str]) -> bool:
+        query = (profile_context.get("target_job_title") or "").strip() or (profile_context.get("target_job_description") or "").strip()[:80]
+        found = self.role_research.peek(query) if query else None
+        return bool(found and (found.get("snippets") or found.get("expectations")))
+
+    def _research_target_role(self, profile_context: dict[str, str], cached_only: bool = False) -> dict[str, Any]:
         job_title = (profile_context.get("target_job_title") or "").strip()
         target_job_description = (profile_context.get("target_job_description") or "").strip()
 
@@ -429,48 +784,17 @@ class AIPipeline:
         if not query:
             return {"query": "", "summary": "", "source": "", "key_expectations": []}
 
-        snippets: list[str] = []
-        sources: list[str] = []
-        expectations: list[str] = []
-
-        try:
-            wiki_url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{quote(query)}"
-            with urlopen(wiki_url, timeout=5) as response:  # noqa: S310
-                payload = json.loads(response.read().decode("utf-8"))
-            extract = (payload.get("extract") or "").strip()
-            if extract:
-                clean_extract = re.sub(r"\s+", " ", extract)
-                snippets.append(clean_extract)
-                page_source = payload.get("content_urls", {}).get("desktop", {}).get("page")
-                if page_source:
-                    sources.append(page_source)
-                expectations.extend(
-                    sentence.strip()
-                    for sentence in re.split(r"(?<=[.!?])\s+", clean_extract)
-                    if sentence.strip()
-                )
-        except Exception:
-            pass
-
-        try:
-            ddg_url = f"https://api.duckduckgo.com/?q={quote(query + ' job requirements skills')}&format=json&no_html=1&skip_disambig=1"
-            with urlopen(ddg_url, timeout=5) as response:  # noqa: S310
-                ddg_payload = json.loads(response.read().decode("utf-8"))
-            abstract = (ddg_payload.get("AbstractText") or "").strip()
-            if abstract:
-                snippets.append(re.sub(r"\s+", " ", abstract))
-            abstract_url = (ddg_payload.get("AbstractURL") or "").strip()
-            if abstract_url:
-                sources.append(abstract_url)
-
-            related_topics = ddg_payload.get("RelatedTopics") or []
-            for topic in related_topics[:4]:
-                text = (topic.get("Text") if isinstance(topic, dict) else "") or ""
-                text = text.strip()
-                if text:
-                    expectations.append(text)
-        except Exception:
-            pass
+        if cached_only:
+            found = self.role_research.peek(query)
+            if found is None:
+                # Fetched in the background, so later analyses of this title are enriched.
+                self.role_research.prefetch(query)
+                found = {}
+        else:
+            found = self.role_research.lookup(query)
+        snippets: list[str] = list(found.get("snippets") or [])
+        sources: list[str] = list(found.get("sources") or [])
+        expectations: list[str] = list(found.get("expectations") or [])
 
         if target_job_description:
             expectations.extend(
@@ -500,51 +824,44 @@ class AIPipeline:
             "key_expectations": deduped_expectations,
         }
 
-    def _extract_cv_signals(self, text: str) -> dict[str, Any]:
-        lower = text.lower()
-
-        years_found = [int(match) for match in re.findall(r"(\d{1,2})\+?\s*(?:years|yrs)", lower)]
-        years_experience = max(years_found) if years_found else 0
-
-        quantified_impacts = re.findall(r"\b\d+(?:\.\d+)?%\b|\$\s?\d+[\d,]*|\b\d+\s*(?:k|m|million|billion)\b", lower)
-        achievement_lines = [line.strip() for line in text.splitlines() if re.search(r"\b(increased|improved|reduced|built|delivered|launched|automated|optimized)\b", line.lower())]
-
-        section_flags = {
-            "has_projects": bool(re.search(r"\bprojects?\b", lower)),
-            "has_certifications": bool(re.search(r"\b(certifications?|certificate|coursera|udemy|aws certified|azure certified|google certified)\b", lower)),
-            "has_education": bool(re.search(r"\b(bachelor|master|phd|degree|university|college)\b", lower)),
-        }
+    def _extract_cv_signals(self, text: str, features: CVFeatures | None = None) -> dict[str, Any]:
+        features = self.cv_scanner.scan(text) if features is None else features
 
-        soft_signals = [
-            label
-            for label, words in {
-                "communication": ["communication", "presentation", "stakeholder"],
-                "leadership": ["led", "managed", "mentored", "supervised"],
-                "problem_solving": ["solved", "optimized", "improved", "debugged"],
-                "collaboration": ["team", "cross-functional", "collaborated"],
-            }.items()
-            if any(word in lower for word in words)
-        ]
+        section_flags = {flag: flag in features.sections for flag in ("has_projects", "has_certifications", "has_education")}
+        soft_signals = [label for label in SOFT_SIGNAL_WORDS if label in features.soft_signals]
 
         return {
-            "years_experience": years_experience,
-            "quantified_impact_count": len(quantified_impacts),
-            "achievement_evidence_count": len(achievement_lines),
+            "years_experience": max(features.years_found) if features.years_found else 0,
+            "quantified_impact_count": len(features.impact_hits),
+            "achievement_evidence_count": len(features.achievement_lines),
             "soft_signals": soft_signals,
             **section_flags,
         }
 
-    def _extract_evidence_snippets(self, text: str, keywords: list[str], limit: int = 3) -> list[str]:
-        lines = [line.strip() for line in re.split(r"[\n\r]+", text) if line.strip()]
-        ranked: list[tuple[int, str]] = []
-        lowered_keywords = [kw.lower() for kw in keywords if kw]
+    def _extract_evidence_snippets(
+        self,
+        text: str,
+        keywords: list[str],
+        limit: int = 3,
+        features: CVFeatures | None = None,
+    ) -> list[str]:
+        features = self.cv_scanner.scan(text) if features is None else features
+        lowered_keywords = list(dict.fromkeys(kw.lower() for kw in keywords if kw))
+
+        # Keywords the automaton already located are mapped to their lines by offset; the rest fall back to substring checks.
+        hit_lines = [features.keyword_lines(kw) for kw in lowered_keywords if kw in self.keyword_automaton.vocabulary]
+        scan_keywords = [kw for kw in lowered_keywords if kw not in self.keyword_automaton.vocabulary]
 
-        for line in lines:
-            lower = line.lower()
-            score = sum(2 for kw in lowered_keywords if kw and kw in lower)
-            if re.search(r"\b(built|developed|implemented|improved|led|optimized|automated|designed|delivered)\b", lower):
+        ranked: list[tuple[int, str]] = []
+        for index, raw_line in enumerate(features.lines):
+            line = raw_line.strip()
+            if not line:
+                continue
+            lower = features.lowered_lines[index]
+            score = sum(2 for lines in hit_lines if index in lines) + sum(2 for kw in scan_keywords if kw in lower)
+            if index in features.evidence_verb_lines:
                 score += 2
-            if re.search(r"\b\d+(?:\.\d+)?%\b|\b\d+\s*(?:k|m|million|billion)\b", lower):
+            if index in features.impact_lines:
                 score += 2
             if score > 0:
                 ranked.append((score, line))
@@ -552,56 +869,76 @@ class AIPipeline:
         ranked.sort(key=lambda item: item[0], reverse=True)
         selected: list[str] = []
         for _, line in ranked:
-            normalized = re.sub(r"\s+", " ", line)
-            if normalized not in selected:
-                selected.append(normalized[:180].rstrip(" ."))
+            snippet = re.sub(r"\s+", " ", line)[:180].rstrip(" .")
+            if snippet not in selected:
+                selected.append(snippet)
             if len(selected) >= limit:
                 break
         return selected
 
-    def _career_insights(self, text: str, profile_context: dict[str, str], research: dict[str, Any] | None = None) -> dict[str, Any]:
+    def _requirement_terms(self, *parts: str) -> list[str]:
+        requirement_blob = " ".join(part.lower() for part in parts if part and part.strip())
+        # A trailing period is sentence punctuation ("a plus."), while inner dots belong to the term ("node.js").
+        raw_terms = [kw.strip().lower().rstrip(".") for kw in re.findall(r"[a-zA-Z][a-zA-Z+.#/-]{2,}", requirement_blob)]
+        requirement_terms = [
+            kw
+            for kw in raw_terms
+            if kw not in REQUIREMENT_STOP_WORDS
+            and "/" not in kw
+            and not kw.endswith("/")
+            and not kw.startswith("/")
+            and (len(kw) >= 4 or kw in SHORT_REQUIREMENT_TERMS)
+        ]
+        return list(dict.fromkeys(requirement_terms))[:90]
+
+    def _career_insights(
+        self,
+        text: str,
+        profile_context: dict[str, str],
+        research: dict[str, Any] | None = None,
+        features: CVFeatures | None = None,
+    ) -> dict[str, Any]:
         content = text.lower()
         skills = (profile_context.get("skills") or "").lower()
         target_job_title = (profile_context.get("target_job_title") or "").lower().strip()
         target_job_description = (profile_context.get("target_job_description") or "").lower()
 
-        research_expectations = [str(item).lower() for item in ((research or {}).get("key_expectations") or [])]
+        research_expectations = " ".join(str(item) for item in ((research or {}).get("key_expectations") or []))
+        # Research is encyclopedic prose, so only the known skill keywords it mentions become requirements.
+        research_terms = " ".join(self.keyword_automaton.find_all(research_expectations))
 
-        stop_words = {
-            "and", "or", "and/or", "the", "for", "with", "from", "your", "role", "job", "that", "this", "have", "will", "using", "into", "are", "to", "of", "in", "on", "at", "as", "etc",
-            "junior", "senior", "mid", "entry", "level", "developer",
-        }
-        requirement_blob = " ".join(part for part in [target_job_title, target_job_description, skills, " ".join(research_expectations)] if part.strip())
-        raw_terms = [kw.strip().lower() for kw in re.findall(r"[a-zA-Z][a-zA-Z+.#/-]{2,}", requirement_blob)]
-        short_allow = {"sql", "api", "aws", "gcp", "c++", "c#", "ui", "ux"}
-        requirement_terms = [
-            kw
-            for kw in raw_terms
-            if kw not in stop_words and "/" not in kw and not kw.endswith("/") and not kw.startswith("/") and (len(kw) >= 4 or kw in short_allow)
-        ]
-        requirement_terms = list(dict.fromkeys(requirement_terms))[:90]
+        requirement_terms = self._requirement_terms(target_job_title, target_job_description, skills, research_terms)
 
-        cv_signals = self._extract_cv_signals(text)
+        features = self.cv_scanner.scan(text) if features is None else features
+        cv_signals = self._extract_cv_signals(text, features)
+        keyword_hits = features.keyword_hits
+        skill_hits = self.keyword_automaton.find_all(skills)
+        requirement_set = set(requirement_terms)
         matched_requirements = [kw for kw in requirement_terms if kw in content]
         missing_requirements = [kw for kw in requirement_terms if kw not in content]
         requirement_fit_percent = int((len(matched_requirements) / max(1, len(requirement_terms))) * 100) if requirement_terms else 0
 
-        scored_profiles: list[tuple[str, int, list[str], list[str], list[str]]] = []
-        for profile, role_keywords in self.profile_map.items():
-            matched_cv = [kw for kw in role_keywords if kw in content]
-            matched_skills = [kw for kw in role_keywords if kw in skills]
-            matched_to_target = [kw for kw in role_keywords if kw in requirement_terms]
-            cv_target_overlap = [kw for kw in matched_cv if kw in requirement_terms]
-
-            evidence_bonus = min(12, cv_signals["quantified_impact_count"] * 2) + min(10, cv_signals["achievement_evidence_count"])
-            score = (len(matched_cv) * 16) + (len(cv_target_overlap) * 11) + (len(matched_skills) * 6) + (len(matched_to_target) * 5) + evidence_bonus
-
-            if score > 0:
-                reasons = list(dict.fromkeys((cv_target_overlap + matched_cv + matched_skills)))[:8]
-                missing = [kw for kw in role_keywords if kw not in set(matched_cv + matched_skills)][:8]
-                scored_profiles.append((profile, score, reasons, missing, matched_cv[:8]))
+        evidence_bonus = min(12, cv_signals["quantified_impact_count"] * 2) + min(10, cv_signals["achievement_evidence_count"])
+        cv_presence = self.role_matrix.presence(keyword_hits)
+        raw_scores = self.role_matrix.raw_scores(
+            cv_presence,
+            skill_presence=self.role_matrix.presence(skill_hits),
+            target_presence=self.role_matrix.presence(requirement_set),
+            evidence_bonus=evidence_bonus,
+        )
+        ranked_rows = [int(row) for row in np.argsort(-raw_scores, kind="stable")[:3] if raw_scores[row] > 0]
 
-        scored_profiles.sort(key=lambda pair: pair[1], reverse=True)
+        # Only the top roles need their keyword breakdowns.
+        scored_profiles: list[tuple[str, int, list[str], list[str], list[str]]] = []
+        for row in ranked_rows:
+            profile = self.role_matrix.roles[row]
+            role_keywords = self.profile_map[profile]
+            matched_cv = [kw for kw in role_keywords if kw in keyword_hits]
+            matched_skills = [kw for kw in role_keywords if kw in skill_hits]
+            cv_target_overlap = [kw for kw in matched_cv if kw in requirement_set]
+            reasons = list(dict.fromkeys((cv_target_overlap + matched_cv + matched_skills)))[:8]
+            missing = [kw for kw in role_keywords if kw not in set(matched_cv + matched_skills)][:8]
+            scored_profiles.append((profile, int(raw_scores[row]), reasons, missing, matched_cv[:8]))
 
         if not scored_profiles:
             return {
@@ -633,7 +970,7 @@ class AIPipeline:
         best_role = profession_scores[0]["name"]
         best_score = profession_scores[0]["score"]
 
-        title_terms = [t for t in re.findall(r"[a-zA-Z][a-zA-Z+.#/-]{2,}", target_job_title) if t not in stop_words]
+        title_terms = [t for t in re.findall(r"[a-zA-Z][a-zA-Z+.#/-]{2,}", target_job_title) if t not in REQUIREMENT_STOP_WORDS]
         target_profile = ""
         if title_terms:
             ranked_targets = sorted(
@@ -663,7 +1000,7 @@ class AIPipeline:
 
         cv_strengths = list(dict.fromkeys(top[0][4] + matched_requirements))[:6]
         cv_gaps = list(dict.fromkeys(missing_requirements + top[0][3]))[:6]
-        evidence_lines = self._extract_evidence_snippets(text, cv_strengths + matched_requirements, limit=3)
+        evidence_lines = self._extract_evidence_snippets(text, cv_strengths + matched_requirements, limit=3, features=features)
 
         if target_role_score >= 78:
             alternative_role = "Not required — target role already matches strongly"
@@ -690,23 +1027,12 @@ class AIPipeline:
             "research_source": (research or {}).get("source", ""),
         }
 
-    def _compose_career_summary(self, career: dict[str, Any], profile_context: dict[str, str], research: dict[str, Any] | None = None) -> str:
-        top_roles = career.get("recommended_professions", [])[:3]
+    def _improvement_steps(self, career: dict[str, Any]) -> list[str]:
         top_scores = career.get("profession_scores", [])
-        cv_strengths = career.get("cv_strengths_for_target", [])[:5]
-        matched_requirements = career.get("matched_requirements", [])[:6]
-        missing_requirements = career.get("missing_requirements", [])[:6]
-        alternative_role = career.get("alternative_role", "General Professional Role")
-
-        target_job_title = (profile_context.get("target_job_title") or "").strip() or "your target role"
         top_score = top_scores[0]["score"] if top_scores else 55
-        top_role = top_scores[0]["name"] if top_scores else "General Professional Role"
-
-        target_fit = career.get("target_fit_percent", top_score)
-        readiness = "Strong" if target_fit >= 82 else "Promising" if target_fit >= 68 else "Needs Improvement"
+        missing_requirements = career.get("missing_requirements", [])[:6]
 
         cv_signal_quality = career.get("cv_signal_quality", {})
-        evidence_lines = career.get("evidence_lines", [])[:2]
         years = cv_signal_quality.get("years_experience", 0)
         impacts = cv_signal_quality.get("quantified_impact_count", 0)
         project_flag = cv_signal_quality.get("has_projects", False)
@@ -726,6 +1052,25 @@ class AIPipeline:
 
         if not recommendation_steps:
             recommendation_steps.append("Focus on interview depth: prepare technical trade-off explanations and impact stories for each key project")
+        return recommendation_steps
+
+    def _compose_career_summary(self, career: dict[str, Any], profile_context: dict[str, str], research: dict[str, Any] | None = None) -> str:
+        top_roles = career.get("recommended_professions", [])[:3]
+        top_scores = career.get("profession_scores", [])
+        cv_strengths = career.get("cv_strengths_for_target", [])[:5]
+        matched_requirements = career.get("matched_requirements", [])[:6]
+        missing_requirements = career.get("missing_requirements", [])[:6]
+        alternative_role = career.get("alternative_role", "General Professional Role")
+
+        target_job_title = (profile_context.get("target_job_title") or "").strip() or "your target role"
+        top_score = top_scores[0]["score"] if top_scores else 55
+        top_role = top_scores[0]["name"] if top_scores else "General Professional Role"
+
+        target_fit = career.get("target_fit_percent", top_score)
+        readiness = "Strong" if target_fit >= 82 else "Promising" if target_fit >= 68 else "Needs Improvement"
+
+        evidence_lines = career.get("evidence_lines", [])[:2]
+        recommendation_steps = self._improvement_steps(career)
 
         top_matches_text = ", ".join(f"{item['name']} ({item['score']}%)" for item in top_scores[:3]) if top_scores else ", ".join(top_roles)
 
@@ -747,26 +1092,50 @@ class AIPipeline:
         return "\n".join(bullets).strip()
 
 
-    def answer_question(self, question: str, cv_text: str, analysis_insights: dict[str, Any] | None = None, summary: str = "") -> str:
+    def _question_prompt(self, question: str, cv_text: str, analysis_insights: dict[str, Any] | None, summary: str) -> str:
         if not question.strip():
             raise RuntimeError("Please ask a question before sending it to OpenRouter.")
 
-        prompt = (
-            "Answer the user's career question using only the uploaded CV text and the prior OpenRouter analysis context. "
+        # Spend a third of the budget on analysis fields and the rest on the CV chunks that best match the question.
+        insight_budget = self.qa_context_token_budget // 3
+        relevant_insights = select_insights(analysis_insights or {}, question, insight_budget)
+        excerpt_budget = self.qa_context_token_budget - estimate_tokens(json.dumps(relevant_insights))
+        excerpts = select_excerpts(self.chunk_indexes.get(cv_text or ""), question, max(excerpt_budget, insight_budget))
+
+        return (
+            "Answer the user's career question using only the uploaded CV excerpts and the prior OpenRouter analysis context. "
             "Be direct, useful, and specific. If the user asks how to improve the CV, give exact bullet ideas, keywords, and wording suggestions they can actually add. "
             "Keep the answer under 180 words.\n\n"
             f"Question: {question}\n"
-            f"Analysis Summary: {summary}\n"
-            f"Analysis Insights JSON: {json.dumps(analysis_insights or {})}\n"
-            f"Uploaded CV Text Excerpt: {(cv_text or '')[:2600]}"
+            f"Analysis Summary: {summary[:700]}\n"
+            f"Relevant Analysis Insights JSON: {json.dumps(relevant_insights)}\n"
+            "Relevant CV Excerpts:\n" + "\n".join(f"- {excerpt}" for excerpt in excerpts)
         )
 
+    def answer_question(self, question: str, cv_text: str, analysis_insights: dict[str, Any] | None = None, summary: str = "") -> str:
         return self._call_openrouter(
-            system_prompt="You are an expert CV coach and job-fit analyst. Return only the answer text.",
-            user_prompt=prompt,
+            system_prompt=QUESTION_SYSTEM_PROMPT,
+            user_prompt=self._question_prompt(question, cv_text, analysis_insights, summary),
             temperature=0.3,
         )
 
+    async def aanswer_question(self, question: str, cv_text: str, analysis_insights: dict[str, Any] | None = None, summary: str = "") -> str:
+        return await self._acall_openrouter(
+            system_prompt=QUESTION_SYSTEM_PROMPT,
+            user_prompt=self._question_prompt(question, cv_text, analysis_insights, summary),
+            temperature=0.3,
+        )
+
+    async def astream_answer(
+        self,
+        question: str,
+        cv_text: str,
+        analysis_insights: dict[str, Any] | None = None,
+        summary: str = "",
+    ) -> AsyncIterator[str]:
+        prompt = self._question_prompt(question, cv_text, analysis_insights, summary)
+        async for delta in self._astream_openrouter(QUESTION_SYSTEM_PROMPT, prompt, temperature=0.3):
+            yield delta
 
 
 ai_pipeline = AIPipeline()
@@ -0,0 +1,192 @@
+import argparse
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any
+from urllib.parse import quote
+
+from backend.services.http import PooledHTTPClient
+
+WIKIPEDIA_SUMMARY_URL = "https://en.wikipedia.org/api/rest_v1/page/summary/{query}"
+DUCKDUCKGO_URL = "https://api.duckduckgo.com/?q={query}&format=json&no_html=1&skip_disambig=1"
+# Titles where neither source answered are retried after a short while instead of the full TTL.
+EMPTY_RESULT_TTL_SECONDS = 300
+
+
+def normalize_role_title(title: str) -> str:
+    return re.sub(r"\s+", " ", (title or "").strip().lower())
+
+
+def _clean(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+class RoleResearchCache:
+    """Public role research (Wikipedia + DuckDuckGo) cached per normalized job title.
+
+    Both sources are fetched concurrently under one shared deadline. The cache can be
+    warmed from an offline JSON snapshot so common titles never hit the network, and
+    ``prefetch`` fills it in the background for callers that must not wait.
+    """
+
+    def __init__(self, ttl_seconds: int, deadline_seconds: float, max_entries: int = 512, live_lookup: bool = True) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.deadline_seconds = deadline_seconds
+        self.max_entries = max(1, max_entries)
+        self.http = PooledHTTPClient(headers={"User-Agent": "NebulaGlass-AI/1.0 role research"})
+        self._entries: OrderedDict[str, tuple[float, float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="role-research")
+        # Separate from _executor, whose workers run the source fetches a lookup waits on.
+        self.live_lookup = live_lookup
+        self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="role-research-prefetch")
+        self._prefetching: set[str] = set()
+
+    def _store(self, key: str, result: dict[str, Any]) -> None:
+        ttl = self.ttl_seconds if result.get("snippets") or result.get("expectations") else EMPTY_RESULT_TTL_SECONDS
+        with self._lock:
+            self._entries[key] = (time.time(), ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def peek(self, query: str) -> dict[str, Any] | None:
+        """Return cached research for the title without touching the network."""
+        key = normalize_role_title(query)
+        with self._lock:
+            cached = self._entries.get(key)
+            if not cached:
+                return None
+            stored_at, ttl, result = cached
+            if time.time() - stored_at > ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def lookup(self, query: str) -> dict[str, Any]:
+        key = normalize_role_title(query)
+        if not key:
+            return {"snippets": [], "sources": [], "expectations": []}
+        cached = self.peek(key)
+        if cached is not None:
+            return cached
+
+        result = self._fetch(query.strip())
+        self._store(key, result)
+        return result
+
+    def prefetch(self, query: str) -> None:
+        """Look the title up in the background unless it is cached or already being fetched."""
+        key = normalize_role_title(query)
+        if not key or not self.live_lookup or self.peek(key) is not None:
+            return
+        with self._lock:
+            if key in self._prefetching:
+                return
+            self._prefetching.add(key)
+        self._prefetcher.submit(self._prefetch, query.strip(), key)
+
+    def _prefetch(self, query: str, key: str) -> None:
+        try:
+            self._store(key, self._fetch(query))
+        finally:
+            with self._lock:
+                self._prefetching.discard(key)
+
+    def _fetch(self, query: str) -> dict[str, Any]:
+        deadline = time.monotonic() + self.deadline_seconds
+        futures = [
+            self._executor.submit(self._fetch_wikipedia, query, self.deadline_seconds),
+            self._executor.submit(self._fetch_duckduckgo, query, self.deadline_seconds),
+        ]
+        wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+
+        result: dict[str, Any] = {"snippets": [], "sources": [], "expectations": []}
+        for future in futures:
+            if not future.done() or future.exception() is not None:
+                continue
+            part = future.result()
+            for field in result:
+                result[field].extend(part[field])
+        return result
+
+    def _get_json(self, url: str, timeout: float) -> dict[str, Any]:
+        response = self.http.client().get(url, timeout=timeout, follow_redirects=True)
+        response.raise_for_status()
+        return response.json()
+
+    def _fetch_wikipedia(self, query: str, timeout: float) -> dict[str, Any]:
+        payload = self._get_json(WIKIPEDIA_SUMMARY_URL.format(query=quote(query)), timeout)
+        part: dict[str, Any] = {"snippets": [], "sources": [], "expectations": []}
+        extract = _clean(payload.get("extract") or "")
+        if extract:
+            part["snippets"].append(extract)
+            page_source = payload.get("content_urls", {}).get("desktop", {}).get("page")
+            if page_source:
+                part["sources"].append(page_source)
+            part["expectations"].extend(
+                sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+", extract) if sentence.strip()
+            )
+        return part
+
+    def _fetch_duckduckgo(self, query: str, timeout: float) -> dict[str, Any]:
+        payload = self._get_json(DUCKDUCKGO_URL.format(query=quote(query + " job requirements skills")), timeout)
+        part: dict[str, Any] = {"snippets": [], "sources": [], "expectations": []}
+        abstract = _clean(payload.get("AbstractText") or "")
+        if abstract:
+            part["snippets"].append(abstract)
+        abstract_url = (payload.get("AbstractURL") or "").strip()
+        if abstract_url:
+            part["sources"].append(abstract_url)
+        for topic in (payload.get("RelatedTopics") or [])[:4]:
+            text = ((topic.get("Text") if isinstance(topic, dict) else "") or "").strip()
+            if text:
+                part["expectations"].append(text)
+        return part
+
+    def load_snapshot(self, path: str | Path) -> int:
+        """Warm the cache from a JSON file shaped like {"roles": {title: {snippets, sources, expectations}}}."""
+        payload = json.loads(Path(path).read_text(encoding="utf-8"))
+        loaded = 0
+        for title, entry in (payload.get("roles") or {}).items():
+            if not isinstance(entry, dict):
+                continue
+            result = {field: [str(item) for item in entry.get(field) or []] for field in ("snippets", "sources", "expectations")}
+            self._store(normalize_role_title(title), result)
+            loaded += 1
+        return loaded
+
+    def write_snapshot(self, path: str | Path) -> int:
+        with self._lock:
+            roles = {key: result for key, (_, _, result) in self._entries.items() if result.get("snippets") or result.get("expectations")}
+        Path(path).write_text(json.dumps({"roles": roles}, indent=2, sort_keys=True), encoding="utf-8")
+        return len(roles)
+
+    def close(self) -> None:
+        self._prefetcher.shutdown(wait=False, cancel_futures=True)
+        self.http.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fetch role research and write an offline snapshot for ROLE_RESEARCH_SNAPSHOT_PATH.")
+    parser.add_argument("output", help="Snapshot JSON file to write")
+    parser.add_argument("titles", nargs="*", help="Job titles to research (defaults to every built-in profile)")
+    args = parser.parse_args()
+
+    from backend.ai.pipeline import ai_pipeline
+
+    research = ai_pipeline.role_research
+    for title in args.titles or list(ai_pipeline.profile_map):
+        research.lookup(title)
+    written = research.write_snapshot(args.output)
+    research.close()
+    print(f"Wrote role research for {written} job titles to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
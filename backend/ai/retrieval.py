@@ -0,0 +1,155 @@
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable
+
+import numpy as np
+
+from backend.ai.compaction import estimate_tokens
+from backend.ai.embeddings import tokenize
+
+# Fields that anchor every answer, whatever the question is about.
+CORE_INSIGHT_FIELDS = ("target_job_title", "target_fit_percent", "target_alignment")
+# Used when the question does not point at any particular field.
+DEFAULT_INSIGHT_FIELDS = ("missing_requirements", "cv_improvement_priorities", "recommended_professions")
+
+
+def chunk_text(text: str, max_words: int = 120) -> list[str]:
+    """Pack consecutive CV lines into chunks of at most ``max_words`` words."""
+    chunks: list[str] = []
+    current: list[str] = []
+    current_words = 0
+    for line in re.split(r"[\r\n\f]+", text or ""):
+        words = line.split()
+        if not words:
+            continue
+        while len(words) > max_words:
+            if current:
+                chunks.append(" ".join(current))
+                current, current_words = [], 0
+            chunks.append(" ".join(words[:max_words]))
+            words = words[max_words:]
+        if current_words + len(words) > max_words and current:
+            chunks.append(" ".join(current))
+            current, current_words = [], 0
+        current.append(" ".join(words))
+        current_words += len(words)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over the chunks of one document."""
+
+    def __init__(self, chunks: list[str], k1: float = 1.5, b: float = 0.75) -> None:
+        self.chunks = chunks
+        tokenized = [tokenize(chunk) for chunk in chunks]
+        lengths = np.array([len(tokens) for tokens in tokenized], dtype=np.float32)
+        average = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+        self._norm = k1 * (1 - b + b * lengths / average)
+        self.k1 = k1
+
+        postings: dict[str, tuple[list[int], list[int]]] = {}
+        for index, tokens in enumerate(tokenized):
+            for term, count in Counter(tokens).items():
+                rows, counts = postings.setdefault(term, ([], []))
+                rows.append(index)
+                counts.append(count)
+        total = len(chunks)
+        self._postings = {
+            term: (
+                np.asarray(rows, dtype=np.int64),
+                np.asarray(counts, dtype=np.float32),
+                math.log(1 + (total - len(rows) + 0.5) / (len(rows) + 0.5)),
+            )
+            for term, (rows, counts) in postings.items()
+        }
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            rows, counts, idf = posting
+            scores[rows] += idf * counts * (self.k1 + 1) / (counts + self._norm[rows])
+        return scores
+
+
+class ChunkIndexCache:
+    """BM25 indexes keyed on a hash of the document text, so each CV is chunked and indexed once."""
+
+    def __init__(self, max_entries: int = 128, max_words: int = 120, prepare: Callable[[str], str] | None = None) -> None:
+        self.max_entries = max(1, max_entries)
+        self.max_words = max_words
+        self.prepare = prepare
+        self._entries: OrderedDict[str, BM25Index] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str) -> BM25Index:
+        key = hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+                return index
+
+        index = BM25Index(chunk_text(self.prepare(text) if self.prepare else text, self.max_words))
+        with self._lock:
+            self._entries[key] = index
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+
+def select_excerpts(index: BM25Index, question: str, token_budget: int) -> list[str]:
+    """Top BM25 chunks that fit the budget, returned in document order.
+
+    When nothing in the CV matches the question, the opening chunks are used instead.
+    """
+    if not index.chunks:
+        return []
+    scores = index.scores(question)
+    ranked = [int(row) for row in np.argsort(-scores, kind="stable") if scores[row] > 0] or list(range(len(index.chunks)))
+
+    chosen: list[int] = []
+    used = 0
+    for row in ranked:
+        cost = estimate_tokens(index.chunks[row])
+        if used + cost > token_budget:
+            if chosen:
+                continue
+            # Always keep at least the best chunk, trimmed to roughly the budget.
+            return [index.chunks[row][: token_budget * 4]]
+        chosen.append(row)
+        used += cost
+    return [index.chunks[row] for row in sorted(chosen)]
+
+
+def select_insights(insights: dict[str, Any], question: str, token_budget: int) -> dict[str, Any]:
+    """Core insight fields plus the fields whose name or content overlaps the question, within the budget."""
+    question_terms = set(tokenize(question))
+    scored: list[tuple[float, str]] = []
+    for field, value in insights.items():
+        if field in CORE_INSIGHT_FIELDS or value in (None, "", [], {}):
+            continue
+        name_terms = set(tokenize(field.replace("_", " ")))
+        value_terms = set(tokenize(json.dumps(value)))
+        score = 3 * len(question_terms & name_terms) + len(question_terms & value_terms)
+        if score:
+            scored.append((score, field))
+    if not scored:
+        scored = [(1, field) for field in DEFAULT_INSIGHT_FIELDS if insights.get(field) not in (None, "", [], {})]
+
+    selected = {field: insights[field] for field in CORE_INSIGHT_FIELDS if insights.get(field) not in (None, "", [], {})}
+    used = estimate_tokens(json.dumps(selected))
+    for _, field in sorted(scored, key=lambda item: -item[0]):
+        cost = estimate_tokens(json.dumps({field: insights[field]}))
+        if used + cost <= token_budget:
+            selected[field] = insights[field]
+            used += cost
+    return selected
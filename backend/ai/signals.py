@@ -0,0 +1,122 @@
+import re
+from bisect import bisect_right
+from dataclasses import dataclass, field
+
+from backend.ai.keywords import KeywordAutomaton
+
+# One alternation walks the lowercased CV once: line breaks, experience spans, numeric impact and plain words.
+_SCAN_PATTERN = re.compile(
+    r"(?P<newline>\r\n|[\n\r\f])"
+    r"|(?P<years>(?P<year_count>\d{1,2})\+?[ \t]*(?:years|yrs))"
+    r"|(?P<percent>\b\d+(?:\.\d+)?%)"
+    r"|(?P<money>\$[ \t]?\d+[\d,]*)"
+    r"|(?P<scale>\b\d+[ \t]*(?:k|m|million|billion)\b)"
+    r"|(?P<word>[a-z]+)"
+)
+_LINE_BREAK = re.compile(r"\r\n|[\n\r\f]")
+
+ACHIEVEMENT_VERBS = frozenset({"increased", "improved", "reduced", "built", "delivered", "launched", "automated", "optimized"})
+EVIDENCE_VERBS = frozenset({"built", "developed", "implemented", "improved", "led", "optimized", "automated", "designed", "delivered"})
+SECTION_WORDS = {
+    "project": "has_projects",
+    "projects": "has_projects",
+    "certification": "has_certifications",
+    "certifications": "has_certifications",
+    "certificate": "has_certifications",
+    "coursera": "has_certifications",
+    "udemy": "has_certifications",
+    "bachelor": "has_education",
+    "master": "has_education",
+    "phd": "has_education",
+    "degree": "has_education",
+    "university": "has_education",
+    "college": "has_education",
+}
+CERTIFYING_VENDORS = frozenset({"aws", "azure", "google"})
+SOFT_SIGNAL_WORDS = {
+    "communication": ["communication", "presentation", "stakeholder"],
+    "leadership": ["led", "managed", "mentored", "supervised"],
+    "problem_solving": ["solved", "optimized", "improved", "debugged"],
+    "collaboration": ["team", "cross-functional", "collaborated"],
+}
+_SOFT_SIGNAL_LOOKUP = {word: label for label, words in SOFT_SIGNAL_WORDS.items() for word in words}
+
+
+@dataclass
+class CVFeatures:
+    """Everything the heuristics need from one scan of a CV."""
+
+    lines: list[str]
+    lowered_lines: list[str]
+    line_starts: list[int]
+    years_found: list[int] = field(default_factory=list)
+    impact_hits: list[str] = field(default_factory=list)
+    impact_lines: set[int] = field(default_factory=set)
+    achievement_lines: set[int] = field(default_factory=set)
+    evidence_verb_lines: set[int] = field(default_factory=set)
+    sections: set[str] = field(default_factory=set)
+    soft_signals: set[str] = field(default_factory=set)
+    keyword_hits: dict[str, list[int]] = field(default_factory=dict)
+
+    def line_of(self, offset: int) -> int:
+        return bisect_right(self.line_starts, offset) - 1
+
+    def keyword_lines(self, keyword: str) -> set[int]:
+        return {self.line_of(position) for position in self.keyword_hits.get(keyword, [])}
+
+
+class CVScanner:
+    def __init__(self, automaton: KeywordAutomaton | None = None) -> None:
+        self.automaton = automaton
+
+    def scan(self, text: str) -> CVFeatures:
+        lowered = text.lower()
+        features = CVFeatures(
+            lines=_LINE_BREAK.split(text),
+            lowered_lines=_LINE_BREAK.split(lowered),
+            line_starts=[0],
+        )
+
+        line = 0
+        previous_word = ""
+        previous_end = -1
+        for match in _SCAN_PATTERN.finditer(lowered):
+            kind = match.lastgroup
+            if kind == "newline":
+                line += 1
+                features.line_starts.append(match.end())
+                continue
+            if kind == "word":
+                word = match.group("word")
+                # Hyphenated words are scanned part by part, as the old \b regexes saw them ("co-led" has "led"),
+                # and also whole, for the few signal words that contain a hyphen ("cross-functional").
+                candidates = [word]
+                if previous_word and match.start() == previous_end + 1 and lowered[previous_end] == "-":
+                    candidates.append(f"{previous_word}-{word}")
+                for candidate in candidates:
+                    singular = candidate[:-1] if candidate.endswith("s") else candidate
+                    if candidate in ACHIEVEMENT_VERBS:
+                        features.achievement_lines.add(line)
+                    if candidate in EVIDENCE_VERBS:
+                        features.evidence_verb_lines.add(line)
+                    section = SECTION_WORDS.get(candidate)
+                    if section:
+                        features.sections.add(section)
+                    soft_signal = _SOFT_SIGNAL_LOOKUP.get(candidate) or _SOFT_SIGNAL_LOOKUP.get(singular)
+                    if soft_signal:
+                        features.soft_signals.add(soft_signal)
+                if word == "certified" and previous_word in CERTIFYING_VENDORS:
+                    features.sections.add("has_certifications")
+                previous_word = word
+                previous_end = match.end()
+                continue
+            if kind == "years":
+                features.years_found.append(int(match.group("year_count")))
+            else:
+                features.impact_hits.append(match.group(kind))
+                if kind != "money":
+                    features.impact_lines.add(line)
+
+        if self.automaton is not None:
+            features.keyword_hits = self.automaton.find_all(text)
+        return features
@@ -16,10 +16,49 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 60 * 24
     database_url: str = "sqlite:///./nebulaglass.db"
     upload_dir: str = "backend/uploads"
+    max_upload_mb: int = 20
+    upload_chunk_bytes: int = 4 * 1024 * 1024
+    upload_session_ttl_hours: int = 24
     openai_api_key: str = ""
     openai_model: str = "gpt-4o-mini"
     openrouter_api_key: str = ""
     openrouter_model: str = "openai/gpt-4o-mini"
+    analysis_provider: str = "openrouter"
+    analysis_hedge_deadline_seconds: float = 2.0
+    analysis_max_input_tokens: int = 2500
+    embedding_dimension: int = 256
+    qa_context_token_budget: int = 900
+    qa_chunk_cache_entries: int = 128
+    role_research_ttl_seconds: int = 24 * 60 * 60
+    role_research_deadline_seconds: float = 4.0
+    role_research_snapshot_path: str = ""
+    role_research_live_lookup: bool = True
+    http_pool_size: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_connect_timeout: float = 5.0
+    http_read_timeout: float = 12.0
+    http2_enabled: bool = True
+    analysis_cache_max_entries: int = 256
+    analysis_cache_ttl_seconds: int = 7 * 24 * 60 * 60
+    analysis_cache_per_document: int = 8
+    analysis_job_max_attempts: int = 3
+    analysis_job_visibility_timeout_seconds: int = 120
+    analysis_job_poll_interval_seconds: float = 1.0
+    analysis_job_retry_backoff_seconds: float = 5.0
+    analysis_worker_processes: int = 2
+    analysis_batch_concurrency: int = 4
+    analysis_batch_commit_size: int = 10
+    analysis_embedded_workers: int = 1
+    extraction_processes: int = 2
+    extraction_timeout_seconds: float = 60.0
+    extraction_memory_limit_mb: int = 1024
+    extraction_pdf_pages_per_job: int = 16
+    extraction_char_budget: int = 40000
+    remote_extraction_cache_dir: str = ""
+    ocr_languages: str = "en"
+    ocr_processes: int = 1
+    ocr_max_concurrency: int = 1
+    ocr_warmup: bool = False
     smtp_host: str = ""
     smtp_port: int = 587
     smtp_username: str = ""
@@ -32,6 +71,8 @@ class Settings(BaseSettings):
     firebase_credentials_path: str = ""
     firebase_credentials_json: str = ""
     blob_read_write_token: str = ""
+    blob_delete_batch_size: int = 100
+    blob_delete_flush_seconds: float = 2.0
 
     model_config = SettingsConfigDict(env_file=ENV_FILES, env_file_encoding="utf-8")
 
@@ -52,6 +52,24 @@ def ensure_user_schema() -> None:
             )
 
 
+def ensure_document_schema() -> None:
+    inspector = inspect(engine)
+    if "documents" not in inspector.get_table_names():
+        return
+
+    columns = {column["name"] for column in inspector.get_columns("documents")}
+    if {"extraction_status", "content_sha256"} <= columns:
+        return
+
+    with engine.begin() as conn:
+        if "extraction_status" not in columns:
+            conn.execute(text("ALTER TABLE documents ADD COLUMN extraction_status VARCHAR(20) NOT NULL DEFAULT 'pending'"))
+            conn.execute(text("UPDATE documents SET extraction_status = 'ready' WHERE text IS NOT NULL AND text <> ''"))
+        if "content_sha256" not in columns:
+            conn.execute(text("ALTER TABLE documents ADD COLUMN content_sha256 VARCHAR(64)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_documents_content_sha256 ON documents (content_sha256)"))
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -16,12 +16,19 @@ from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.exc import SQLAlchemyError
 
-from backend.database.config import Settings
-from backend.database.session import Base, engine, ensure_user_schema
-from backend.models import analysis, document, user  # noqa: F401
+# Imported for its table only; the name analysis_cache below is the service-level cache.
+import backend.models.analysis_cache  # noqa: F401
+from backend.ai.extraction import extraction_pool, ocr_pool, remote_http, warm_up_extraction
+from backend.ai.pipeline import ai_pipeline
+from backend.database.config import Settings, get_settings
+from backend.database.session import Base, engine, ensure_document_schema, ensure_user_schema
+from backend.models import analysis, document, job, stored_object, upload_session, user  # noqa: F401
 from backend.routes.analysis import router as analysis_router
 from backend.routes.auth import router as auth_router
 from backend.routes.documents import router as documents_router
+from backend.services.analysis_cache import analysis_cache
+from backend.services.blob_store import blob_store
+from backend.services.jobs import embedded_workers
 
 app = FastAPI(title="NebulaGlass AI API", version="1.0.0")
 
@@ -40,6 +47,7 @@ database_startup_error = ""
 try:
     Base.metadata.create_all(bind=engine)
     ensure_user_schema()
+    ensure_document_schema()
 except Exception as exc:  # noqa: BLE001
     database_startup_error = f"{type(exc).__name__}: {exc}"
     print(f"[startup] Database initialization failed: {database_startup_error}")
@@ -53,6 +61,32 @@ async def database_exception_handler(_request: Request, exc: SQLAlchemyError):
         content={"detail": "Database is not reachable. Check DATABASE_URL on the backend."},
     )
 
+
+@app.on_event("startup")
+def start_embedded_workers():
+    worker_count = get_settings().analysis_embedded_workers
+    if not database_startup_error and worker_count > 0:
+        embedded_workers.start(worker_count)
+
+
+@app.on_event("startup")
+def warm_ocr_models():
+    if get_settings().ocr_warmup:
+        warm_up_extraction()
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    embedded_workers.stop()
+    ai_pipeline.http.close()
+    await ai_pipeline.http.aclose()
+    ai_pipeline.role_research.close()
+    extraction_pool.close()
+    ocr_pool.close()
+    remote_http.close()
+    blob_store.close()
+
+
 for api_prefix in ("", "/api"):
     app.include_router(auth_router, prefix=api_prefix)
     app.include_router(documents_router, prefix=api_prefix)
@@ -102,6 +136,7 @@ def env_check():
         "required": required,
         "optional": optional,
         "database_startup_error": database_startup_error or None,
+        "analysis_cache": analysis_cache.stats(),
     }
 
 
@@ -137,6 +172,8 @@ def spa_fallback(full_path: str):
         "analyze",
         "analysis",
         "ask-question",
+        "jobs",
+        "rank-candidates",
     )):
         return {"detail": "Not Found"}
 
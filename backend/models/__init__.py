@@ -1,5 +1,9 @@
 from .analysis import Analysis
+from .analysis_cache import AnalysisCacheEntry
 from .document import Document
+from .job import AnalysisJob
+from .stored_object import StoredObject
+from .upload_session import UploadSession
 from .user import User
 
-__all__ = ["User", "Document", "Analysis"]
+__all__ = ["User", "Document", "Analysis", "AnalysisCacheEntry", "AnalysisJob", "StoredObject", "UploadSession"]
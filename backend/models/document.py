@@ -13,7 +13,12 @@ class Document(Base):
     filename = Column(String(255), nullable=False)
     file_path = Column(String(500), nullable=False)
     text = Column(Text, nullable=True)
+    # pending -> extracting -> ready | failed; filled by the background extraction after upload.
+    extraction_status = Column(String(20), nullable=False, default="pending", server_default="pending")
+    content_sha256 = Column(String(64), nullable=True, index=True)
     upload_date = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="documents")
     analysis = relationship("Analysis", back_populates="document", uselist=False, cascade="all, delete-orphan")
+    cached_analyses = relationship("AnalysisCacheEntry", cascade="all, delete-orphan")
+    analysis_jobs = relationship("AnalysisJob", cascade="all, delete-orphan")
@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String, UniqueConstraint
+
+from backend.database.session import Base
+
+
+class StoredObject(Base):
+    """One stored copy of some uploaded bytes, shared by every document of one user with the same content.
+
+    Objects are never shared across users: a shared object would hand one user's extracted text to
+    another and reveal whether a given file had already been uploaded.
+    """
+
+    __tablename__ = "stored_objects"
+    # The extension is part of the identity: extraction picks its parser from the stored file's suffix.
+    __table_args__ = (UniqueConstraint("user_id", "sha256", "suffix", name="uq_stored_objects_user_sha256_suffix"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    sha256 = Column(String(64), nullable=False, index=True)
+    suffix = Column(String(16), nullable=False, default="")
+    file_path = Column(String(500), nullable=False, unique=True)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
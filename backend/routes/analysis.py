@@ -1,18 +1,31 @@
-from fastapi import APIRouter, Body, Depends, HTTPException, status
-from pydantic import BaseModel
+import asyncio
+import json
+import time
+from typing import Any
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
-from backend.ai.extraction import TextExtractor
 from backend.ai.pipeline import ai_pipeline
-from backend.database.session import get_db
+from backend.database.session import SessionLocal, get_db
 from backend.models.analysis import Analysis
 from backend.models.document import Document
+from backend.models.job import AnalysisJob
 from backend.models.user import User
 from backend.schemas.document import AnalysisResponse
+from backend.services.analysis import analyze_and_save, analyze_batch, ensure_document_text, rank_documents
+from backend.services.analysis_cache import analyze_with_cache
 from backend.services.dependencies import get_current_user
+from backend.services.jobs import enqueue_analysis_job
 
 router = APIRouter(tags=["analysis"])
 
+JOB_EVENTS_POLL_SECONDS = 0.5
+JOB_EVENTS_MAX_SECONDS = 600
+
 
 class JobsResponse(BaseModel):
     jobs: list[str]
@@ -28,6 +41,24 @@ class AnalyzeRequest(BaseModel):
     profession: str | None = None
     target_job_title: str | None = None
     target_job_description: str | None = None
+    provider: str | None = Field(default=None, pattern="^(openrouter|local|auto|hedged)$")
+
+
+class BatchAnalyzeItem(AnalyzeRequest):
+    document_id: int
+
+
+class BatchAnalyzeRequest(BaseModel):
+    documents: list[BatchAnalyzeItem] = Field(min_length=1, max_length=100)
+    provider: str | None = Field(default=None, pattern="^(openrouter|local|auto|hedged)$")
+
+
+class RankCandidatesRequest(BaseModel):
+    job_description: str = Field(min_length=1)
+    job_title: str | None = None
+    document_ids: list[int] | None = Field(default=None, max_length=1000)
+    top_n: int = Field(default=3, ge=0, le=10)
+    provider: str | None = Field(default=None, pattern="^(openrouter|local|auto|hedged)$")
 
 
 @router.get("/jobs", response_model=JobsResponse)
@@ -36,10 +67,33 @@ def get_available_jobs():
     return {"jobs": list(ai_pipeline.profile_map.keys())}
 
 
+def _profile_context(payload: AnalyzeRequest | None) -> dict[str, str]:
+    return {
+        "skills": payload.skills or "",
+        "interests": payload.interests or "",
+        "profession": payload.profession or payload.interests or "",
+        "target_job_title": payload.target_job_title or "",
+        "target_job_description": payload.target_job_description or "",
+    } if payload else {}
+
+
+# Registered before /analyze/{document_id} so "batch" is not parsed as a document id.
+@router.post("/analyze/batch")
+def analyze_documents_batch(payload: BatchAnalyzeRequest, current_user: User = Depends(get_current_user)):
+    items = [(item.document_id, _profile_context(item), item.provider) for item in payload.documents]
+    events = analyze_batch(current_user.id, items, provider=payload.provider)
+    return StreamingResponse(
+        (json.dumps(event, default=str) + "\n" for event in events),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/analyze/{document_id}", response_model=AnalysisResponse)
 def analyze_document(
     document_id: int,
     payload: AnalyzeRequest | None = Body(default=None),
+    mode: str = Query(default="sync", pattern="^(sync|async)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -47,29 +101,25 @@ def analyze_document(
     if not doc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
 
-    text_content = (doc.text or "").strip()
-    if not text_content:
-        try:
-            text_content = TextExtractor.extract(doc.file_path)
-            doc.text = text_content
-            db.add(doc)
-            db.commit()
-            db.refresh(doc)
-        except Exception as exc:  # noqa: BLE001
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail=f"We could not read this file for analysis. Please upload PDF, DOCX, DOC, TXT, CSV, RTF, PNG, or JPG/JPEG. ({exc})",
-            ) from exc
-
-    profile_context = {
-        "skills": payload.skills or "",
-        "interests": payload.interests or "",
-        "profession": payload.profession or payload.interests or "",
-        "target_job_title": payload.target_job_title or "",
-        "target_job_description": payload.target_job_description or "",
-    } if payload else {}
+    profile_context = _profile_context(payload)
+    provider = payload.provider if payload else None
+    if mode == "async":
+        job = enqueue_analysis_job(db, current_user.id, doc.id, profile_context, provider=provider)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"job_id": job.id, "status": job.status, "stage": job.stage},
+        )
+
     try:
-        result = ai_pipeline.analyze(text_content, profile_context=profile_context)
+        text_content = ensure_document_text(db, doc)
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"We could not read this file for analysis. Please upload PDF, DOCX, DOC, TXT, CSV, RTF, PNG, or JPG/JPEG. ({exc})",
+        ) from exc
+
+    try:
+        result = analyze_and_save(db, doc.id, text_content, profile_context, provider=provider)
     except RuntimeError as exc:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)) from exc
     except Exception as exc:  # noqa: BLE001
@@ -77,20 +127,79 @@ def analyze_document(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Analysis engine encountered an internal error: {exc}",
         ) from exc
-    record = db.query(Analysis).filter(Analysis.document_id == doc.id).first()
-    if not record:
-        record = Analysis(document_id=doc.id)
-        db.add(record)
-
-    record.summary = result["summary"]
-    record.classification = result["classification"]
-    record.entities = result["entities"]
-    record.embeddings = result["embeddings"]
-    record.insights = result["insights"]
-    db.commit()
     return AnalysisResponse(document_id=doc.id, **result)
 
 
+def _sse_event(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _job_snapshot(job_id: str) -> dict[str, Any] | None:
+    with SessionLocal() as db:
+        job = db.get(AnalysisJob, job_id)
+        if not job:
+            return None
+
+        event = {"job_id": job.id, "status": job.status, "stage": job.stage, "attempts": job.attempts}
+        if job.status == "failed":
+            event["error"] = job.error
+        elif job.status == "succeeded":
+            record = db.query(Analysis).filter(Analysis.document_id == job.document_id).first()
+            if record:
+                event["analysis"] = AnalysisResponse(
+                    document_id=record.document_id,
+                    summary=record.summary,
+                    classification=record.classification,
+                    entities=record.entities,
+                    embeddings=record.embeddings,
+                    insights=record.insights,
+                ).model_dump()
+        return event
+
+
+async def _job_event_stream(job_id: str):
+    # Async so an open watcher waits on the event loop; only the short DB read borrows a threadpool thread.
+    last_state = None
+    deadline = time.monotonic() + JOB_EVENTS_MAX_SECONDS
+    last_sent = time.monotonic()
+
+    while time.monotonic() < deadline:
+        event = await run_in_threadpool(_job_snapshot, job_id)
+        if event is None:
+            yield _sse_event("failed", {"job_id": job_id, "status": "failed", "stage": "failed", "error": "Job not found"})
+            return
+
+        state = (event["status"], event["stage"], event["attempts"])
+        if state != last_state:
+            last_state = state
+            last_sent = time.monotonic()
+            if event["status"] == "failed":
+                yield _sse_event("failed", event)
+                return
+            if event["status"] == "succeeded":
+                yield _sse_event("completed", event)
+                return
+            yield _sse_event("stage", event)
+
+        if time.monotonic() - last_sent >= 15:
+            last_sent = time.monotonic()
+            yield ": keep-alive\n\n"
+        await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+
+
+@router.get("/jobs/{job_id}/events")
+def stream_job_events(job_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id, AnalysisJob.user_id == current_user.id).first()
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    return StreamingResponse(
+        _job_event_stream(job.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/analysis/{document_id}", response_model=AnalysisResponse)
 def get_analysis(document_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     record = (
@@ -111,38 +220,72 @@ def get_analysis(document_id: int, db: Session = Depends(get_db), current_user:
     )
 
 
-@router.post("/ask-question/{document_id}")
-def ask_question(
-    document_id: int,
-    payload: QuestionRequest,
+@router.get("/analysis/{document_id}/fit-matrix")
+def get_fit_matrix(document_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    doc = db.query(Document).filter(Document.id == document_id, Document.user_id == current_user.id).first()
+    if not doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+
+    try:
+        text = ensure_document_text(db, doc)
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unable to read document text: {exc}") from exc
+
+    return {"document_id": doc.id, "roles": ai_pipeline.role_fit_landscape(text)}
+
+
+@router.post("/rank-candidates")
+def rank_candidates(
+    payload: RankCandidatesRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    """Shortlist the user's CVs against one job description; only the top_n get a full LLM analysis."""
+    try:
+        return rank_documents(
+            db,
+            current_user.id,
+            job_title=payload.job_title or "",
+            job_description=payload.job_description,
+            document_ids=payload.document_ids,
+            top_n=payload.top_n,
+            provider=payload.provider,
+        )
+    except RuntimeError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)) from exc
+
+
+def _question_context(db: Session, document_id: int, current_user: User) -> tuple[str, dict[str, Any], str]:
     doc = db.query(Document).filter(Document.id == document_id, Document.user_id == current_user.id).first()
     if not doc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
 
-    text = (doc.text or "").strip()
-    if not text:
-        try:
-            text = TextExtractor.extract(doc.file_path)
-            doc.text = text
-            db.add(doc)
-            db.commit()
-            db.refresh(doc)
-        except Exception as exc:  # noqa: BLE001
-            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unable to read document text for Q&A: {exc}") from exc
+    try:
+        text = ensure_document_text(db, doc)
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unable to read document text for Q&A: {exc}") from exc
 
     record = db.query(Analysis).filter(Analysis.document_id == doc.id).first()
+    if record:
+        return text, record.insights or {}, record.summary or ""
+
     try:
-        if record:
-            insights = record.insights or {}
-            summary = record.summary or ""
-        else:
-            generated = ai_pipeline.analyze(text, profile_context={})
-            insights = generated.get("insights") or {}
-            summary = generated.get("summary") or ""
+        generated = analyze_with_cache(db, doc.id, text, {})
+        db.commit()
+    except RuntimeError as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)) from exc
+    return text, generated.get("insights") or {}, generated.get("summary") or ""
 
+
+@router.post("/ask-question/{document_id}")
+def ask_question(
+    document_id: int,
+    payload: QuestionRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    text, insights, summary = _question_context(db, document_id, current_user)
+    try:
         answer = ai_pipeline.answer_question(payload.question, text, analysis_insights=insights, summary=summary)
     except RuntimeError as exc:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)) from exc
@@ -151,3 +294,48 @@ def ask_question(
         "question": payload.question,
         "answer": answer,
     }
+
+
+async def _answer_event_stream(question: str, text: str, insights: dict[str, Any], summary: str):
+    answer_parts: list[str] = []
+    try:
+        async for delta in ai_pipeline.astream_answer(question, text, analysis_insights=insights, summary=summary):
+            answer_parts.append(delta)
+            yield _sse_event("delta", {"text": delta})
+    except RuntimeError as exc:
+        if answer_parts:
+            yield _sse_event("error", {"detail": str(exc)})
+            return
+        # Nothing was relayed yet, so fall back to a single non-streaming completion.
+        try:
+            answer = await ai_pipeline.aanswer_question(question, text, analysis_insights=insights, summary=summary)
+        except RuntimeError as fallback_exc:
+            yield _sse_event("error", {"detail": str(fallback_exc)})
+            return
+        answer_parts.append(answer)
+        yield _sse_event("delta", {"text": answer})
+
+    yield _sse_event("done", {"question": question, "answer": "".join(answer_parts)})
+
+
+@router.post("/ask-question/{document_id}/stream")
+def ask_question_stream(
+    document_id: int,
+    payload: QuestionRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if not payload.question.strip():
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Please ask a question before sending it to OpenRouter.")
+
+    text, insights, summary = _question_context(db, document_id, current_user)
+    # Checked before streaming starts so an unconfigured backend answers 503, as the JSON endpoint does.
+    try:
+        ai_pipeline.ensure_openrouter_configured()
+    except RuntimeError as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)) from exc
+    return StreamingResponse(
+        _answer_event_stream(payload.question, text, insights, summary),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
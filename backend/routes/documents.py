@@ -1,48 +1,200 @@
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from pathlib import Path
+
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, File, HTTPException, Query, UploadFile, status
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
+from backend.ai.pipeline import ai_pipeline
 from backend.database.session import get_db
 from backend.models.document import Document
+from backend.models.upload_session import UploadSession
 from backend.models.user import User
-from backend.schemas.document import DocumentDetailResponse, DocumentResponse
+from backend.schemas.document import DocumentDetailResponse, DocumentMatchResponse, DocumentResponse
+from backend.services.analysis import ensure_document_text
 from backend.services.dependencies import get_current_user
-from backend.services.storage import blob_storage_enabled, delete_upload, save_upload
+from backend.services.extraction import extract_uploaded_document
+from backend.services.storage import StoredUpload, UploadTooLarge, delete_upload, release_upload, save_upload, upload_limit_bytes
+from backend.services.upload_sessions import (
+    UploadSessionError,
+    abort_upload_session,
+    assemble_upload_session,
+    create_upload_session,
+    finish_upload_session,
+    session_status,
+    write_chunk,
+)
+from backend.services.vector_index import vector_index
 
 router = APIRouter(tags=["documents"])
+ALLOWED_EXTENSIONS = {".pdf", ".docx", ".doc", ".txt", ".csv", ".rtf", ".png", ".jpg", ".jpeg"}
+
+
+class UploadSessionRequest(BaseModel):
+    filename: str = Field(min_length=1, max_length=255)
+    size: int = Field(gt=0)
+    content_type: str | None = None
+
+
+class SearchRequest(BaseModel):
+    query: str = Field(min_length=1)
+    k: int = Field(default=10, ge=1, le=100)
+
+
+def _check_extension(file_name: str) -> None:
+    extension = file_name[file_name.rfind(".") :].lower() if "." in file_name else ""
+    if extension not in ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file type")
+
+
+def _create_document(db: Session, background_tasks: BackgroundTasks, user_id: int, file_name: str, stored: StoredUpload) -> dict:
+    # A user's byte-identical uploads share the stored object, so text already extracted from it is reused as is.
+    twin = None
+    if stored.deduplicated:
+        twin = (
+            db.query(Document)
+            .filter(
+                Document.user_id == user_id,
+                Document.file_path == stored.file_path,
+                Document.extraction_status.in_(("ready", "partial")),
+            )
+            .order_by(Document.id.asc())
+            .first()
+        )
+
+    document = Document(
+        user_id=user_id,
+        filename=file_name,
+        file_path=stored.file_path,
+        text=twin.text if twin else "",
+        extraction_status=twin.extraction_status if twin else "pending",
+        content_sha256=stored.sha256,
+    )
+    db.add(document)
+    db.commit()
+    db.refresh(document)
+    if twin is None:
+        # Respond as soon as the file is stored; text is extracted from the local copy after the response is sent.
+        background_tasks.add_task(extract_uploaded_document, document.id, stored.local_path, stored.local_path_is_temporary)
+    elif stored.local_path_is_temporary:
+        Path(stored.local_path).unlink(missing_ok=True)
+    return {
+        "id": document.id,
+        "filename": document.filename,
+        "upload_date": document.upload_date,
+        "is_analyzed": False,
+        "extraction_status": document.extraction_status,
+    }
+
 
 @router.post("/upload", response_model=DocumentResponse)
 def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    allowed = {".pdf", ".docx", ".doc", ".txt", ".csv", ".rtf", ".png", ".jpg", ".jpeg"}
     file_name = file.filename or "document"
-    extension = file_name[file_name.rfind(".") :].lower() if "." in file_name else ""
-    if extension not in allowed:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file type")
+    _check_extension(file_name)
 
-    file_bytes = file.file.read()
+    limit_bytes = upload_limit_bytes()
+    if file.size is not None and file.size > limit_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(UploadTooLarge(limit_bytes)))
 
-    if blob_storage_enabled() and len(file_bytes) > 4_400_000:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail="This file is too large for Vercel server uploads. Keep uploads under 4.4 MB or switch to client uploads.",
+    # Streamed to storage in fixed-size chunks; the size limit and content hash are applied on the way.
+    try:
+        stored = save_upload(
+            db,
+            user_id=current_user.id,
+            file_name=file_name,
+            source=file.file,
+            content_type=file.content_type,
         )
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(exc)) from exc
 
-    stored_path = save_upload(
-        file_name=file_name,
-        file_bytes=file_bytes,
-        user_id=current_user.id,
-        content_type=file.content_type,
-    )
+    return _create_document(db, background_tasks, current_user.id, file_name, stored)
+
+
+def _get_upload_session(db: Session, upload_id: str, user_id: int) -> UploadSession:
+    session = db.query(UploadSession).filter(UploadSession.id == upload_id, UploadSession.user_id == user_id).first()
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    return session
+
+
+@router.post("/uploads", status_code=status.HTTP_201_CREATED)
+def start_resumable_upload(
+    payload: UploadSessionRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Open a resumable upload; the response gives the chunk size and how many chunks to PUT."""
+    _check_extension(payload.filename)
+    try:
+        session = create_upload_session(db, current_user.id, payload.filename, payload.size, payload.content_type)
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(exc)) from exc
+    return session_status(session)
+
+
+@router.put("/uploads/{upload_id}/chunks/{index}")
+def put_upload_chunk(
+    upload_id: str,
+    index: int,
+    chunk: bytes = Body(..., media_type="application/octet-stream"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    session = _get_upload_session(db, upload_id, current_user.id)
+    try:
+        write_chunk(db, session, index, chunk)
+    except UploadSessionError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+    return session_status(session)
 
-    # Keep upload fast and reliable: defer heavy text extraction to analysis time.
-    document = Document(user_id=current_user.id, filename=file_name, file_path=stored_path, text="")
-    db.add(document)
-    db.commit()
-    db.refresh(document)
-    return {"id": document.id, "filename": document.filename, "upload_date": document.upload_date, "is_analyzed": False}
+
+@router.get("/uploads/{upload_id}")
+def get_resumable_upload(upload_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return session_status(_get_upload_session(db, upload_id, current_user.id))
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=DocumentResponse)
+def complete_resumable_upload(
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    session = _get_upload_session(db, upload_id, current_user.id)
+    if session.status == "completed" and session.document_id:
+        # Completing twice (e.g. after a lost response) returns the same document.
+        doc = db.query(Document).filter(Document.id == session.document_id, Document.user_id == current_user.id).first()
+        if doc:
+            return {
+                "id": doc.id,
+                "filename": doc.filename,
+                "upload_date": doc.upload_date,
+                "is_analyzed": bool(doc.analysis),
+                "extraction_status": doc.extraction_status,
+            }
+
+    try:
+        stored = assemble_upload_session(db, session)
+    except UploadSessionError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(exc)) from exc
+
+    response = _create_document(db, background_tasks, current_user.id, session.filename, stored)
+    finish_upload_session(db, session, response["id"])
+    return response
+
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def cancel_resumable_upload(upload_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    session = _get_upload_session(db, upload_id, current_user.id)
+    if session.status == "open":
+        abort_upload_session(db, session)
 
 
 @router.get("/documents", response_model=list[DocumentResponse])
@@ -54,17 +206,92 @@ def list_documents(db: Session = Depends(get_db), current_user: User = Depends(g
             "filename": doc.filename,
             "upload_date": doc.upload_date,
             "is_analyzed": bool(doc.analysis),
+            "extraction_status": doc.extraction_status,
         }
         for doc in docs
     ]
 
 
+def _matches(db: Session, user_id: int, ranked: list[tuple[int, float]]) -> list[dict]:
+    docs = {doc.id: doc for doc in db.query(Document).filter(Document.user_id == user_id, Document.id.in_([doc_id for doc_id, _ in ranked])).all()}
+    return [
+        {
+            "id": doc_id,
+            "filename": docs[doc_id].filename,
+            "upload_date": docs[doc_id].upload_date,
+            "is_analyzed": True,
+            "score": round(score, 4),
+        }
+        for doc_id, score in ranked
+        if doc_id in docs and score > 0
+    ]
+
+
+@router.get("/documents/similar/{document_id}", response_model=list[DocumentMatchResponse])
+def similar_documents(
+    document_id: int,
+    k: int = Query(default=5, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    doc = db.query(Document).filter(Document.id == document_id, Document.user_id == current_user.id).first()
+    if not doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+
+    query = vector_index.vector_for(db, current_user.id, doc.id)
+    if query is None:
+        if not (doc.text or "").strip():
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Analyze this document before searching for similar ones.")
+        query = ai_pipeline.embedder.embed(doc.text)
+
+    ranked = vector_index.search(db, current_user.id, query, k=k, exclude=doc.id)
+    return _matches(db, current_user.id, ranked)
+
+
+@router.post("/documents/search", response_model=list[DocumentMatchResponse])
+def search_documents(payload: SearchRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    query = ai_pipeline.embedder.embed(payload.query)
+    if not query.any():
+        return []
+    ranked = vector_index.search(db, current_user.id, query, k=payload.k)
+    return _matches(db, current_user.id, ranked)
+
+
 @router.get("/documents/{document_id}", response_model=DocumentDetailResponse)
 def get_document(document_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     doc = db.query(Document).filter(Document.id == document_id, Document.user_id == current_user.id).first()
     if not doc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
-    return {"id": doc.id, "filename": doc.filename, "upload_date": doc.upload_date, "text": doc.text, "is_analyzed": bool(doc.analysis)}
+    return {
+        "id": doc.id,
+        "filename": doc.filename,
+        "upload_date": doc.upload_date,
+        "text": doc.text,
+        "is_analyzed": bool(doc.analysis),
+        "extraction_status": doc.extraction_status,
+    }
+
+
+@router.post("/documents/{document_id}/extract", response_model=DocumentDetailResponse)
+def extract_full_text(document_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Read a ``partial`` document to the end; analysis and Q&A only extract up to the character budget."""
+    doc = db.query(Document).filter(Document.id == document_id, Document.user_id == current_user.id).first()
+    if not doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+
+    try:
+        ensure_document_text(db, doc, full=True)
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unable to read document text: {exc}") from exc
+
+    return {
+        "id": doc.id,
+        "filename": doc.filename,
+        "upload_date": doc.upload_date,
+        "text": doc.text,
+        "is_analyzed": bool(doc.analysis),
+        "extraction_status": doc.extraction_status,
+    }
 
 
 @router.delete("/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -73,7 +300,10 @@ def delete_document(document_id: int, db: Session = Depends(get_db), current_use
     if not doc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
 
-    delete_upload(doc.file_path)
-
+    orphaned_path = release_upload(db, doc.file_path)
     db.delete(doc)
     db.commit()
+    # The stored file goes only when no other document shares it, and only after the rows are gone.
+    if orphaned_path:
+        delete_upload(orphaned_path)
+    vector_index.remove(current_user.id, document_id)
@@ -9,6 +9,7 @@ class DocumentResponse(BaseModel):
     filename: str
     upload_date: datetime
     is_analyzed: bool = False
+    extraction_status: str | None = None
 
     class Config:
         from_attributes = True
@@ -18,6 +19,10 @@ class DocumentDetailResponse(DocumentResponse):
     text: str | None = None
 
 
+class DocumentMatchResponse(DocumentResponse):
+    score: float
+
+
 class AnalysisResponse(BaseModel):
     document_id: int
     summary: str | None
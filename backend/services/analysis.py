@@ -0,0 +1,335 @@
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import Any, Callable, Iterator
+
+from sqlalchemy.orm import Session
+
+from backend.ai.extraction import TextExtractor
+from backend.ai.pipeline import ai_pipeline
+from backend.database.config import get_settings
+from backend.database.session import SessionLocal
+from backend.models.analysis import Analysis
+from backend.models.document import Document
+from backend.services.analysis_cache import analysis_cache, analyze_with_cache, cache_when_done, is_cacheable
+from backend.services.extraction import extraction_status
+from backend.services.vector_index import vector_index
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_document_text(db: Session, doc: Document, full: bool = False) -> str:
+    """Stored text, extracting it first if needed.
+
+    Analysis and Q&A read only up to ``EXTRACTION_CHAR_BUDGET`` characters; ``full=True`` re-reads a
+    ``partial`` document to the end.
+    """
+    text_content = (doc.text or "").strip()
+    if text_content and not (full and doc.extraction_status == "partial"):
+        return text_content
+
+    text_content, complete = TextExtractor.collect(
+        TextExtractor.iter_text(doc.file_path),
+        None if full else get_settings().extraction_char_budget,
+    )
+    doc.text = text_content
+    doc.extraction_status = extraction_status(text_content, complete)
+    db.add(doc)
+    db.commit()
+    db.refresh(doc)
+    return text_content
+
+
+def save_analysis(db: Session, document_id: int, result: dict[str, Any]) -> Analysis:
+    record = db.query(Analysis).filter(Analysis.document_id == document_id).first()
+    if not record:
+        record = Analysis(document_id=document_id)
+        db.add(record)
+
+    record.summary = result["summary"]
+    record.classification = result["classification"]
+    record.entities = result["entities"]
+    record.embeddings = result["embeddings"]
+    record.insights = result["insights"]
+    return record
+
+
+def _upgrade_provisional(document_id: int, cache_key: str, provisional_summary: str, pending: Future) -> None:
+    if pending.cancelled() or pending.exception() is not None:
+        logger.warning("Hedged OpenRouter analysis for document %s did not finish: %s", document_id, pending.exception())
+        return
+
+    result = pending.result()
+    try:
+        with SessionLocal() as db:
+            if db.get(Document, document_id) is None:
+                return
+            analysis_cache.put(db, cache_key, document_id, result)
+            record = db.query(Analysis).filter(Analysis.document_id == document_id).first()
+            # Only replace the row if it still holds the provisional result we returned.
+            if record and (record.insights or {}).get("analysis_provider") == "local-provisional" and record.summary == provisional_summary:
+                save_analysis(db, document_id, result)
+            db.commit()
+    except Exception:  # noqa: BLE001
+        logger.exception("Could not store the upgraded analysis for document %s", document_id)
+
+
+def register_upgrade(document_id: int, cache_key: str, provisional_summary: str, pending: Future) -> None:
+    """Replace a committed ``local-provisional`` analysis with the OpenRouter result once it lands."""
+    pending.add_done_callback(lambda finished: _upgrade_provisional(document_id, cache_key, provisional_summary, finished))
+
+
+def analyze_and_save(
+    db: Session,
+    document_id: int,
+    text: str,
+    profile_context: dict[str, str],
+    on_stage: Callable[[str], None] | None = None,
+    provider: str | None = None,
+) -> dict[str, Any]:
+    provisional: list[tuple[str, Future]] = []
+    result = analyze_with_cache(
+        db,
+        document_id,
+        text,
+        profile_context,
+        on_stage=on_stage,
+        provider=provider,
+        on_provisional=lambda key, pending: provisional.append((key, pending)),
+    )
+
+    if on_stage:
+        on_stage("persisting")
+    record = save_analysis(db, document_id, result)
+    db.commit()
+    vector_index.upsert(record.document.user_id, document_id, result["embeddings"])
+
+    # Register the upgrade only after the provisional row is committed, so it cannot be overwritten by it.
+    for key, pending in provisional:
+        register_upgrade(document_id, key, result["summary"], pending)
+    return result
+
+
+def run_document_analysis(
+    db: Session,
+    doc: Document,
+    profile_context: dict[str, str],
+    on_stage: Callable[[str], None] | None = None,
+    provider: str | None = None,
+) -> dict[str, Any]:
+    if on_stage:
+        on_stage("extracting")
+    text_content = ensure_document_text(db, doc)
+    return analyze_and_save(db, doc.id, text_content, profile_context, on_stage=on_stage, provider=provider)
+
+
+def _read_within_budget(file_path: str) -> tuple[str, str]:
+    text, complete = TextExtractor.collect(TextExtractor.iter_text(file_path), get_settings().extraction_char_budget)
+    return text, extraction_status(text, complete)
+
+
+def _analyze_batch_item(
+    file_path: str,
+    text: str,
+    profile_context: dict[str, str],
+    provider: str,
+) -> tuple[str, str | None, dict[str, Any], str | None, tuple[str, Future] | None]:
+    """Runs on a batch worker thread.
+
+    Returns (text, new extraction status or None, result, cache key to store or None, upgrade), where
+    ``upgrade`` is the cache key and pending OpenRouter future of a provisional hedged result.
+    """
+    status = None
+    if not text.strip():
+        text, status = _read_within_budget(file_path)
+
+    key = ai_pipeline.analysis_cache_key(text, profile_context, provider=provider)
+    with SessionLocal() as db:
+        cached = analysis_cache.get(db, key)
+        db.commit()
+    if cached is not None:
+        return text, status, cached, None, None
+
+    if provider == "hedged":
+        result, pending = ai_pipeline.analyze_hedged(text, profile_context)
+        upgrade = (key, pending) if pending is not None else None
+    else:
+        result = ai_pipeline.analyze(text, profile_context=profile_context, provider=provider)
+        upgrade = None
+    return text, status, result, key if is_cacheable(provider, result) else None, upgrade
+
+
+def _commit_batch(
+    db: Session,
+    user_id: int,
+    analyzed: list[tuple[int, dict[str, Any]]],
+    upgrades: list[tuple[int, str, str, Future]],
+) -> None:
+    db.commit()
+    for document_id, result in analyzed:
+        vector_index.upsert(user_id, document_id, result["embeddings"])
+    # Provisional rows are committed now, so their upgrades cannot be overwritten by them.
+    for upgrade in upgrades:
+        register_upgrade(*upgrade)
+
+
+def analyze_batch(
+    user_id: int,
+    items: list[tuple[int, dict[str, str], str | None]],
+    provider: str | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Analyze many documents concurrently, yielding one event per document as it finishes.
+
+    At most ANALYSIS_BATCH_CONCURRENCY analyses run at once, and finished Analysis rows are
+    committed together every ANALYSIS_BATCH_COMMIT_SIZE documents.
+    """
+    settings = get_settings()
+    commit_size = max(1, settings.analysis_batch_commit_size)
+    succeeded = failed = 0
+
+    with SessionLocal() as db:
+        unique_items = {document_id: (context, item_provider) for document_id, context, item_provider in reversed(items)}
+        docs = {
+            doc.id: doc
+            for doc in db.query(Document).filter(Document.user_id == user_id, Document.id.in_(list(unique_items))).all()
+        }
+        executor = ThreadPoolExecutor(max_workers=max(1, settings.analysis_batch_concurrency), thread_name_prefix="analysis-batch")
+        futures: dict[Future, Document] = {}
+        pending: list[tuple[int, dict[str, Any]]] = []
+        upgrades: list[tuple[int, str, str, Future]] = []
+        try:
+            for document_id, _, _ in items:
+                if document_id not in unique_items:
+                    continue
+                context, item_provider = unique_items.pop(document_id)
+                doc = docs.get(document_id)
+                if doc is None:
+                    failed += 1
+                    yield {"document_id": document_id, "status": "failed", "error": "Document not found"}
+                    continue
+                resolved = ai_pipeline.resolve_provider(item_provider or provider)
+                futures[executor.submit(_analyze_batch_item, doc.file_path, doc.text or "", context, resolved)] = doc
+
+            for future in as_completed(futures):
+                doc = futures[future]
+                try:
+                    text, text_status, result, cache_key, upgrade = future.result()
+                except Exception as exc:  # noqa: BLE001
+                    failed += 1
+                    yield {"document_id": doc.id, "status": "failed", "error": str(exc) or type(exc).__name__}
+                    continue
+
+                if text_status:
+                    doc.text = text
+                    doc.extraction_status = text_status
+                if cache_key:
+                    analysis_cache.put(db, cache_key, doc.id, result)
+                save_analysis(db, doc.id, result)
+                pending.append((doc.id, result))
+                if upgrade:
+                    upgrades.append((doc.id, upgrade[0], result["summary"], upgrade[1]))
+                succeeded += 1
+                yield {"document_id": doc.id, "status": "succeeded", "analysis": {"document_id": doc.id, **result}}
+
+                if len(pending) >= commit_size:
+                    _commit_batch(db, user_id, pending, upgrades)
+                    pending, upgrades = [], []
+        finally:
+            # Runs on completion and on client disconnect alike, so finished analyses are never dropped.
+            executor.shutdown(wait=True, cancel_futures=True)
+            if pending:
+                _commit_batch(db, user_id, pending, upgrades)
+
+    yield {"status": "done", "succeeded": succeeded, "failed": failed}
+
+
+def _extract_missing_texts(db: Session, docs: list[Document]) -> list[int]:
+    """Extract text for documents that have none, in parallel; returns the ids that could not be read."""
+    missing = [doc for doc in docs if not (doc.text or "").strip()]
+    if not missing:
+        return []
+
+    unreadable: list[int] = []
+    with ThreadPoolExecutor(max_workers=max(1, get_settings().analysis_batch_concurrency), thread_name_prefix="extract") as executor:
+        futures = {executor.submit(_read_within_budget, doc.file_path): doc for doc in missing}
+        for future in as_completed(futures):
+            doc = futures[future]
+            try:
+                doc.text, doc.extraction_status = future.result()
+            except Exception:  # noqa: BLE001
+                logger.warning("Could not extract text for document %s", doc.id)
+                doc.extraction_status = "failed"
+            if doc.extraction_status == "failed":
+                unreadable.append(doc.id)
+    db.commit()
+    return unreadable
+
+
+def rank_documents(
+    db: Session,
+    user_id: int,
+    job_title: str,
+    job_description: str,
+    document_ids: list[int] | None = None,
+    top_n: int = 3,
+    provider: str | None = None,
+) -> dict[str, Any]:
+    """Rank a user's CVs against one job description, with full analyses for the top ``top_n`` only."""
+    query = db.query(Document).filter(Document.user_id == user_id)
+    if document_ids:
+        query = query.filter(Document.id.in_(document_ids))
+    docs = query.order_by(Document.id.asc()).all()
+
+    unreadable = set(_extract_missing_texts(db, docs))
+    readable = [doc for doc in docs if doc.id not in unreadable]
+    scores = ai_pipeline.rank_candidates([doc.text for doc in readable], job_title, job_description) if readable else []
+
+    candidates = sorted(
+        ({"document_id": doc.id, "filename": doc.filename, **score} for doc, score in zip(readable, scores)),
+        key=lambda candidate: -candidate["score"],
+    )
+
+    shortlist = candidates[: max(0, top_n)]
+    if shortlist:
+        context = {"target_job_title": job_title, "target_job_description": job_description}
+        resolved = ai_pipeline.resolve_provider(provider)
+        docs_by_id = {doc.id: doc for doc in readable}
+        with ThreadPoolExecutor(max_workers=max(1, get_settings().analysis_batch_concurrency), thread_name_prefix="deep-dive") as executor:
+            futures = {
+                executor.submit(
+                    _analyze_batch_item,
+                    docs_by_id[candidate["document_id"]].file_path,
+                    docs_by_id[candidate["document_id"]].text,
+                    context,
+                    resolved,
+                ): candidate
+                for candidate in shortlist
+            }
+            for future in as_completed(futures):
+                candidate = futures[future]
+                try:
+                    _, _, result, cache_key, upgrade = future.result()
+                except Exception as exc:  # noqa: BLE001
+                    candidate["deep_dive"] = {"error": str(exc) or type(exc).__name__}
+                    continue
+                if cache_key:
+                    analysis_cache.put(db, cache_key, candidate["document_id"], result)
+                if upgrade:
+                    # Deep dives are not stored as Analysis rows, so the late OpenRouter result goes to the cache.
+                    upgrade_key, late_result = upgrade
+                    late_result.add_done_callback(partial(cache_when_done, upgrade_key, candidate["document_id"]))
+                insights = result.get("insights") or {}
+                candidate["deep_dive"] = {
+                    "summary": result.get("summary"),
+                    "target_fit_percent": insights.get("target_fit_percent"),
+                    "target_alignment": insights.get("target_alignment"),
+                    "missing_requirements": insights.get("missing_requirements", []),
+                    "analysis_provider": insights.get("analysis_provider"),
+                }
+        db.commit()
+
+    return {
+        "job_title": job_title,
+        "candidates": candidates,
+        "unreadable_document_ids": sorted(unreadable),
+    }
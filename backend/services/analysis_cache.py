@@ -0,0 +1,178 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from sqlalchemy.orm import Session
+
+from backend.ai.pipeline import ai_pipeline
+from backend.database.config import get_settings
+from backend.database.session import SessionLocal
+from backend.models.analysis_cache import AnalysisCacheEntry
+from backend.models.document import Document
+
+logger = logging.getLogger(__name__)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class AnalysisCache:
+    """Two-tier cache for analysis results: an in-process LRU in front of the analysis_cache table."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int, per_document: int) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.per_document = max(1, per_document)
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.database_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remember(self, key: str, result: dict[str, Any], stored_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (stored_at, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, db: Session, key: str) -> dict[str, Any] | None:
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and now - cached[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return copy.deepcopy(cached[1])
+            if cached:
+                del self._entries[key]
+
+        entry = db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.cache_key == key).first()
+        if entry is not None:
+            stored_at = _as_utc(entry.created_at).timestamp()
+            if now - stored_at <= self.ttl_seconds:
+                self._remember(key, copy.deepcopy(entry.result), stored_at)
+                with self._lock:
+                    self.database_hits += 1
+                return copy.deepcopy(entry.result)
+            db.delete(entry)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, db: Session, key: str, document_id: int | None, result: dict[str, Any]) -> None:
+        """Stage the result in the session without flushing; the caller's commit persists it with the Analysis row."""
+        stored_at = datetime.now(timezone.utc)
+        # Without autoflush, an entry staged earlier in this session is only visible through db.new.
+        entry = next((obj for obj in db.new if isinstance(obj, AnalysisCacheEntry) and obj.cache_key == key), None)
+        if entry is None:
+            entry = db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.cache_key == key).first()
+        if entry is None:
+            entry = AnalysisCacheEntry(cache_key=key, document_id=document_id)
+            db.add(entry)
+        entry.result = copy.deepcopy(result)
+        entry.created_at = stored_at
+
+        if document_id is not None:
+            expired_before = stored_at - timedelta(seconds=self.ttl_seconds)
+            siblings = (
+                db.query(AnalysisCacheEntry)
+                .filter(AnalysisCacheEntry.document_id == document_id, AnalysisCacheEntry.cache_key != key)
+                .order_by(AnalysisCacheEntry.created_at.desc(), AnalysisCacheEntry.id.desc())
+                .all()
+            )
+            stale = [
+                sibling
+                for index, sibling in enumerate(siblings)
+                if index >= self.per_document - 1 or _as_utc(sibling.created_at) < expired_before
+            ]
+            for sibling in stale:
+                db.delete(sibling)
+            with self._lock:
+                self.evictions += len(stale)
+
+        self._remember(key, copy.deepcopy(result), stored_at.timestamp())
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "memory_entries": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "database_hits": self.database_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def is_cacheable(provider: str, result: dict[str, Any]) -> bool:
+    # An "auto" or "hedged" run answered by the local scorer is not cached, so the next request retries OpenRouter.
+    return provider not in ("auto", "hedged") or result["insights"].get("analysis_provider") == "openrouter"
+
+
+def cache_when_done(key: str, document_id: int | None, pending: Future) -> None:
+    """Done-callback for a hedged run: store the late OpenRouter result so the next request gets it."""
+    if pending.cancelled() or pending.exception() is not None:
+        logger.warning("Hedged OpenRouter analysis for document %s did not finish: %s", document_id, pending.exception())
+        return
+
+    try:
+        with SessionLocal() as db:
+            if document_id is not None and db.get(Document, document_id) is None:
+                return
+            analysis_cache.put(db, key, document_id, pending.result())
+            db.commit()
+    except Exception:  # noqa: BLE001
+        logger.exception("Could not cache the upgraded analysis for document %s", document_id)
+
+
+def analyze_with_cache(
+    db: Session,
+    document_id: int | None,
+    text: str,
+    profile_context: dict[str, str],
+    on_stage: Callable[[str], None] | None = None,
+    provider: str | None = None,
+    on_provisional: Callable[[str, Future], None] | None = None,
+) -> dict[str, Any]:
+    """Cached analysis for ``text``.
+
+    A ``hedged`` run that returns a provisional local result hands ``on_provisional`` the cache key and
+    the still-running OpenRouter future; without it, the OpenRouter result is cached once it lands.
+    """
+    provider = ai_pipeline.resolve_provider(provider)
+    key = ai_pipeline.analysis_cache_key(text, profile_context, provider=provider)
+    cached = analysis_cache.get(db, key)
+    if cached is not None:
+        return cached
+
+    if provider == "hedged":
+        if on_stage:
+            on_stage("calling_model")
+        result, pending = ai_pipeline.analyze_hedged(text, profile_context)
+        if pending is not None:
+            if on_provisional is not None:
+                on_provisional(key, pending)
+            else:
+                pending.add_done_callback(lambda finished: cache_when_done(key, document_id, finished))
+    else:
+        result = ai_pipeline.analyze(text, profile_context=profile_context, on_stage=on_stage, provider=provider)
+    if is_cacheable(provider, result):
+        analysis_cache.put(db, key, document_id, result)
+    return result
+
+
+settings = get_settings()
+analysis_cache = AnalysisCache(
+    max_entries=settings.analysis_cache_max_entries,
+    ttl_seconds=settings.analysis_cache_ttl_seconds,
+    per_document=settings.analysis_cache_per_document,
+)
@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+from backend.database.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """One long-lived Vercel Blob client per process plus a deferred, batched delete queue.
+
+    The client keeps its HTTP connections open between uploads. Deletes are queued and a
+    background thread sends them in batches of up to ``batch_size`` URLs per API call, so
+    callers return without waiting on the remote delete. Failed batches are retried a few
+    times; whatever is still queued at shutdown is flushed by ``close()``.
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval_seconds: float = 2.0, max_attempts: int = 3) -> None:
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_seconds = max(0.0, flush_interval_seconds)
+        self.max_attempts = max(1, max_attempts)
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._pending: dict[str, int] = {}
+        self._condition = threading.Condition()
+        self._worker: threading.Thread | None = None
+        self._stopping = False
+
+    @staticmethod
+    def _token() -> str:
+        return (os.getenv("BLOB_READ_WRITE_TOKEN", "").strip() or get_settings().blob_read_write_token).strip()
+
+    def client(self) -> Any:
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from vercel.blob import BlobClient
+
+                    self._client = BlobClient(token=self._token() or None)
+        return self._client
+
+    def delete_later(self, url: str) -> None:
+        with self._condition:
+            self._pending.setdefault(url, 0)
+            if self._worker is None or not self._worker.is_alive():
+                self._stopping = False
+                self._worker = threading.Thread(target=self._run, name="blob-deletes", daemon=True)
+                self._worker.start()
+            self._condition.notify()
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def _take_batch(self) -> dict[str, int]:
+        batch = dict(list(self._pending.items())[: self.batch_size])
+        for url in batch:
+            del self._pending[url]
+        return batch
+
+    def _send(self, batch: dict[str, int]) -> None:
+        try:
+            self.client().delete(list(batch))
+        except Exception as exc:  # noqa: BLE001
+            retry = {url: attempts + 1 for url, attempts in batch.items() if attempts + 1 < self.max_attempts}
+            logger.warning("Blob delete of %d file(s) failed (%s); %d will be retried", len(batch), exc, len(retry))
+            with self._condition:
+                for url, attempts in retry.items():
+                    self._pending.setdefault(url, attempts)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending and self._stopping:
+                    return
+            # Let deletes that arrive close together share one API call.
+            if not self._stopping and self.flush_interval_seconds:
+                time.sleep(self.flush_interval_seconds)
+            with self._condition:
+                batch = self._take_batch()
+            if batch:
+                self._send(batch)
+
+    def flush(self) -> None:
+        """Send every queued delete now, in the calling thread."""
+        while True:
+            with self._condition:
+                batch = self._take_batch()
+            if not batch:
+                return
+            self._send(batch)
+
+    def close(self) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout=10)
+        self.flush()
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+
+settings = get_settings()
+blob_store = BlobStore(
+    batch_size=settings.blob_delete_batch_size,
+    flush_interval_seconds=settings.blob_delete_flush_seconds,
+)
@@ -0,0 +1,57 @@
+import logging
+from pathlib import Path
+
+from backend.ai.extraction import TextExtractor
+from backend.database.config import get_settings
+from backend.database.session import SessionLocal
+from backend.models.document import Document
+
+logger = logging.getLogger(__name__)
+
+
+def extraction_status(text: str, complete: bool) -> str:
+    if not text.strip():
+        return "failed"
+    return "ready" if complete else "partial"
+
+
+def _set_status(document_id: int, status: str, text: str | None = None) -> bool:
+    with SessionLocal() as db:
+        doc = db.get(Document, document_id)
+        if doc is None:
+            return False
+        # An analysis request may have extracted the text first; never overwrite it.
+        if doc.extraction_status in {"ready", "partial"} and (doc.text or "").strip():
+            return False
+        doc.extraction_status = status
+        if text is not None:
+            doc.text = text
+        db.commit()
+        return True
+
+
+def extract_uploaded_document(document_id: int, local_path: str, remove_after: bool = False) -> None:
+    """Background task run after upload: extract from the local copy of the upload and store the text.
+
+    Blob uploads pass the temp file they were streamed through (``remove_after=True``), so the
+    blob is never downloaded again. Only the first ``EXTRACTION_CHAR_BUDGET`` characters are
+    read; longer documents are marked ``partial``.
+    """
+    try:
+        if not _set_status(document_id, "extracting"):
+            return
+
+        try:
+            text_content, complete = TextExtractor.collect(
+                TextExtractor.iter_text(local_path),
+                get_settings().extraction_char_budget,
+            )
+        except Exception:
+            logger.exception("Text extraction failed for document %s", document_id)
+            _set_status(document_id, "failed")
+            return
+
+        _set_status(document_id, extraction_status(text_content, complete), text_content)
+    finally:
+        if remove_after:
+            Path(local_path).unlink(missing_ok=True)
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import weakref
+from typing import Any
+
+import httpx
+
+from backend.database.config import get_settings
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PooledHTTPClient:
+    """Process-wide httpx clients that keep connections alive between calls.
+
+    The sync client is shared by every threadpool worker. Async clients are bound
+    to the event loop that created them, so one is kept per running loop.
+    """
+
+    def __init__(self, base_url: str = "", headers: dict[str, str] | None = None) -> None:
+        self.base_url = base_url
+        self.headers = headers or {}
+        self._client: httpx.Client | None = None
+        self._async_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _options(self) -> dict[str, Any]:
+        settings = get_settings()
+        pool_size = max(1, settings.http_pool_size)
+        return {
+            "base_url": self.base_url,
+            "headers": self.headers,
+            "http2": settings.http2_enabled and _http2_available(),
+            "limits": httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=settings.http_keepalive_expiry,
+            ),
+            "timeout": httpx.Timeout(
+                connect=settings.http_connect_timeout,
+                read=settings.http_read_timeout,
+                write=settings.http_read_timeout,
+                pool=settings.http_connect_timeout,
+            ),
+        }
+
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(**self._options())
+        return self._client
+
+    def async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(**self._options())
+            self._async_clients[loop] = client
+        return client
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
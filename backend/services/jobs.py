@@ -0,0 +1,220 @@
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from backend.database.config import get_settings
+from backend.database.session import SessionLocal
+from backend.models.document import Document
+from backend.models.job import AnalysisJob
+from backend.services.analysis import run_document_analysis
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _lease_deadline() -> datetime:
+    return _utcnow() + timedelta(seconds=settings.analysis_job_visibility_timeout_seconds)
+
+
+def _claimable(now: datetime):
+    # A requeued job carries locked_until as its not-before time until its retry backoff has passed.
+    return or_(
+        and_(AnalysisJob.status == "queued", or_(AnalysisJob.locked_until.is_(None), AnalysisJob.locked_until < now)),
+        and_(
+            AnalysisJob.status == "running",
+            AnalysisJob.locked_until < now,
+            AnalysisJob.attempts < AnalysisJob.max_attempts,
+        ),
+    )
+
+
+def _fail_abandoned_jobs(db: Session, now: datetime) -> None:
+    """Fail lease-expired jobs with no attempts left, so a job that keeps killing its worker stops being retried."""
+    db.execute(
+        update(AnalysisJob)
+        .where(
+            AnalysisJob.status == "running",
+            AnalysisJob.locked_until < now,
+            AnalysisJob.attempts >= AnalysisJob.max_attempts,
+        )
+        .values(
+            status="failed",
+            stage="failed",
+            locked_by=None,
+            locked_until=None,
+            error="The analysis worker stopped before finishing this job",
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff before a failed job's next attempt: the base delay, doubled per attempt made."""
+    return timedelta(seconds=max(0.0, settings.analysis_job_retry_backoff_seconds) * 2 ** max(0, attempts - 1))
+
+
+def enqueue_analysis_job(
+    db: Session,
+    user_id: int,
+    document_id: int,
+    profile_context: dict[str, str],
+    provider: str | None = None,
+) -> AnalysisJob:
+    job = AnalysisJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        document_id=document_id,
+        profile_context=profile_context,
+        provider=provider,
+        status="queued",
+        stage="queued",
+        max_attempts=max(1, settings.analysis_job_max_attempts),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def claim_next_job(db: Session, worker_id: str) -> AnalysisJob | None:
+    """Atomically lease one queued (or lease-expired) job for this worker."""
+    now = _utcnow()
+    _fail_abandoned_jobs(db, now)
+    candidates = (
+        db.query(AnalysisJob.id)
+        .filter(_claimable(now))
+        .order_by(AnalysisJob.created_at.asc())
+        .limit(5)
+        .all()
+    )
+    for (job_id,) in candidates:
+        claimed = db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id, _claimable(now))
+            .values(
+                status="running",
+                locked_by=worker_id,
+                locked_until=_lease_deadline(),
+                attempts=AnalysisJob.attempts + 1,
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if claimed.rowcount == 1:
+            return db.get(AnalysisJob, job_id)
+    return None
+
+
+def set_job_stage(job_id: str, worker_id: str, stage: str) -> None:
+    # Stage updates double as lease heartbeats and use their own session so SSE readers see them immediately.
+    with SessionLocal() as db:
+        db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id, AnalysisJob.locked_by == worker_id)
+            .values(stage=stage, locked_until=_lease_deadline(), updated_at=_utcnow())
+        )
+        db.commit()
+
+
+def _finish_job(job_id: str, worker_id: str, error: str | None = None) -> None:
+    with SessionLocal() as db:
+        job = db.get(AnalysisJob, job_id)
+        if not job or job.locked_by != worker_id:
+            return
+
+        job.locked_by = None
+        job.locked_until = None
+        if error is None:
+            job.status = "succeeded"
+            job.stage = "completed"
+            job.error = None
+        elif job.attempts < job.max_attempts:
+            job.status = "queued"
+            job.stage = "queued"
+            job.error = error
+            job.locked_until = _utcnow() + _retry_delay(job.attempts)
+        else:
+            job.status = "failed"
+            job.stage = "failed"
+            job.error = error
+        db.commit()
+
+
+def process_job(job_id: str, worker_id: str) -> None:
+    with SessionLocal() as db:
+        job = db.get(AnalysisJob, job_id)
+        if not job:
+            return
+        doc = db.query(Document).filter(Document.id == job.document_id, Document.user_id == job.user_id).first()
+        if not doc:
+            _finish_job(job_id, worker_id, error="Document not found")
+            return
+
+        try:
+            run_document_analysis(
+                db,
+                doc,
+                job.profile_context or {},
+                on_stage=lambda stage: set_job_stage(job_id, worker_id, stage),
+                provider=job.provider,
+            )
+        except Exception as exc:  # noqa: BLE001
+            db.rollback()
+            logger.exception("Analysis job %s failed", job_id)
+            _finish_job(job_id, worker_id, error=str(exc) or type(exc).__name__)
+            return
+
+    _finish_job(job_id, worker_id)
+
+
+def run_worker(worker_id: str, stop_event: threading.Event | None = None) -> None:
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            with SessionLocal() as db:
+                job = claim_next_job(db, worker_id)
+                job_id = job.id if job else None
+        except Exception:  # noqa: BLE001
+            logger.exception("Worker %s could not poll the job queue", worker_id)
+            job_id = None
+
+        if job_id:
+            process_job(job_id, worker_id)
+        else:
+            stop_event.wait(settings.analysis_job_poll_interval_seconds)
+
+
+class EmbeddedWorkers:
+    """Worker threads inside the web process for single-service deployments."""
+
+    def __init__(self) -> None:
+        self._stop_event = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self, count: int) -> None:
+        self._stop_event.clear()
+        for index in range(count):
+            worker_id = f"web-{uuid.uuid4().hex[:8]}-{index}"
+            thread = threading.Thread(target=run_worker, args=(worker_id, self._stop_event), name=worker_id, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads.clear()
+
+
+embedded_workers = EmbeddedWorkers()
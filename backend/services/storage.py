@@ -1,11 +1,45 @@
+import hashlib
 import os
 import secrets
+import tempfile
+from dataclasses import dataclass
 from pathlib import Path
+from typing import BinaryIO
 from urllib.parse import urlparse
 
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
 from backend.database.config import get_settings
+from backend.models.stored_object import StoredObject
+from backend.services.blob_store import blob_store
 
 settings = get_settings()
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Vercel rejects server-side request bodies above 4.5 MB, so blob uploads through the API stop short of it.
+BLOB_SERVER_UPLOAD_LIMIT_BYTES = 4_400_000
+
+
+class UploadTooLarge(ValueError):
+    def __init__(self, limit_bytes: int) -> None:
+        if blob_storage_enabled() and limit_bytes == BLOB_SERVER_UPLOAD_LIMIT_BYTES:
+            message = "This file is too large for Vercel server uploads. Keep uploads under 4.4 MB or switch to client uploads."
+        else:
+            message = f"This file is too large. Keep uploads under {limit_bytes / 1_000_000:g} MB."
+        super().__init__(message)
+        self.limit_bytes = limit_bytes
+
+
+@dataclass
+class StoredUpload:
+    file_path: str
+    size: int
+    sha256: str
+    # Local copy of the bytes for the background extractor: the stored file itself, or a temp file for blob uploads.
+    local_path: str
+    local_path_is_temporary: bool = False
+    # True when identical bytes were already stored and this upload shares that object.
+    deduplicated: bool = False
 
 
 def blob_storage_enabled() -> bool:
@@ -17,28 +51,134 @@ def is_blob_url(file_path: str) -> bool:
     return parsed.scheme in {"http", "https"} and parsed.netloc.endswith("blob.vercel-storage.com")
 
 
-def save_upload(file_name: str, file_bytes: bytes, user_id: int, content_type: str | None = None) -> str:
-    safe_name = Path(file_name).name
-
-    if blob_storage_enabled():
-        from vercel.blob import BlobClient
-
-        pathname = f"documents/{user_id}/{secrets.token_urlsafe(8)}-{safe_name}"
-        with BlobClient() as client:
-            blob = client.put(
-                pathname,
-                file_bytes,
+def upload_limit_bytes(resumable: bool = False) -> int:
+    """Size cap for one upload; resumable uploads arrive in small chunks, so the blob request cap does not apply."""
+    limit = max(1, settings.max_upload_mb) * 1_000_000
+    return min(limit, BLOB_SERVER_UPLOAD_LIMIT_BYTES) if blob_storage_enabled() and not resumable else limit
+
+
+def _copy_limited(source: BinaryIO, target: BinaryIO, limit_bytes: int) -> tuple[int, str]:
+    """Copy in fixed-size chunks, hashing as we go; raises UploadTooLarge as soon as the limit is passed."""
+    digest = hashlib.sha256()
+    size = 0
+    while chunk := source.read(UPLOAD_CHUNK_BYTES):
+        size += len(chunk)
+        if size > limit_bytes:
+            raise UploadTooLarge(limit_bytes)
+        digest.update(chunk)
+        target.write(chunk)
+    return size, digest.hexdigest()
+
+
+def _stage(source: BinaryIO, suffix: str, limit_bytes: int, directory: Path | None) -> tuple[Path, int, str]:
+    """Stream the upload into a staging file, returning its path, size and SHA-256."""
+    if directory is not None:
+        directory.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix + ".part", dir=directory) as staging_file:
+        staged = Path(staging_file.name)
+        try:
+            size, sha256 = _copy_limited(source, staging_file, limit_bytes)
+        except Exception:
+            staging_file.close()
+            staged.unlink(missing_ok=True)
+            raise
+    return staged, size, sha256
+
+
+def _claim_object(db: Session, user_id: int, sha256: str, suffix: str) -> StoredObject | None:
+    """Take a reference on an existing object of this user's with this content, if there is one."""
+    owned = db.query(StoredObject).filter(
+        StoredObject.user_id == user_id,
+        StoredObject.sha256 == sha256,
+        StoredObject.suffix == suffix,
+    )
+    claimed = owned.update({StoredObject.ref_count: StoredObject.ref_count + 1}, synchronize_session=False)
+    if not claimed:
+        return None
+    return owned.one()
+
+
+def save_upload(
+    db: Session,
+    user_id: int,
+    file_name: str,
+    source: BinaryIO,
+    content_type: str | None = None,
+    limit_bytes: int | None = None,
+) -> StoredUpload:
+    """Store an upload once per user and distinct content; repeat uploads take a reference on the existing object.
+
+    Object rows are staged on ``db``; the caller's commit persists them together with the Document.
+    """
+    suffix = Path(Path(file_name).name).suffix.lower()
+    limit_bytes = limit_bytes or upload_limit_bytes()
+    use_blob = blob_storage_enabled()
+    objects_dir = Path(settings.upload_dir) / "objects"
+    staged, size, sha256 = _stage(source, suffix, limit_bytes, None if use_blob else objects_dir)
+
+    try:
+        existing = _claim_object(db, user_id, sha256, suffix)
+        if existing is not None:
+            if use_blob:
+                # The temp copy still saves the background extractor a download.
+                return StoredUpload(existing.file_path, size, sha256, str(staged), local_path_is_temporary=True, deduplicated=True)
+            staged.unlink(missing_ok=True)
+            return StoredUpload(existing.file_path, size, sha256, existing.file_path, deduplicated=True)
+
+        # Every object gets a path of its own. Deleting an object's file is deferred (blob deletes are batched),
+        # so re-uploading the same bytes in the meantime must not land on the path that is about to be deleted.
+        if use_blob:
+            blob = blob_store.client().upload_file(
+                staged,
+                f"documents/objects/{user_id}/{sha256}{suffix}",
                 access="private",
                 content_type=content_type,
-                add_random_suffix=False,
+                add_random_suffix=True,
             )
-            return blob.url
-
-    upload_dir = Path(settings.upload_dir)
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    target_path = upload_dir / f"{user_id}_{safe_name}"
-    target_path.write_bytes(file_bytes)
-    return str(target_path)
+            stored = StoredUpload(blob.url, size, sha256, str(staged), local_path_is_temporary=True)
+        else:
+            target_path = objects_dir / str(user_id) / sha256[:2] / f"{sha256}-{secrets.token_hex(8)}{suffix}"
+            target_path.parent.mkdir(parents=True, exist_ok=True)
+            staged.replace(target_path)
+            stored = StoredUpload(str(target_path), size, sha256, str(target_path))
+
+        try:
+            with db.begin_nested():
+                db.add(StoredObject(user_id=user_id, sha256=sha256, suffix=suffix, file_path=stored.file_path, size=size, ref_count=1))
+        except IntegrityError:
+            # A concurrent upload of the same bytes registered the object first; share it and drop our copy.
+            existing = _claim_object(db, user_id, sha256, suffix)
+            if existing is None:
+                raise
+            delete_upload(stored.file_path)
+            if use_blob:
+                return StoredUpload(existing.file_path, size, sha256, str(staged), local_path_is_temporary=True, deduplicated=True)
+            return StoredUpload(existing.file_path, size, sha256, existing.file_path, deduplicated=True)
+        return stored
+    except Exception:
+        staged.unlink(missing_ok=True)
+        raise
+
+
+def release_upload(db: Session, file_path: str) -> str | None:
+    """Drop one document's reference to its stored file.
+
+    Returns the path to delete once the caller has committed, or None while other documents
+    still share the object.
+    """
+    stored_object = db.query(StoredObject).filter(StoredObject.file_path == file_path).first()
+    if stored_object is None:
+        # Uploads stored before deduplication have a file of their own.
+        return file_path or None
+    db.query(StoredObject).filter(StoredObject.id == stored_object.id).update(
+        {StoredObject.ref_count: StoredObject.ref_count - 1},
+        synchronize_session=False,
+    )
+    db.refresh(stored_object)
+    if stored_object.ref_count > 0:
+        return None
+    db.delete(stored_object)
+    return file_path
 
 
 def delete_upload(file_path: str) -> None:
@@ -46,10 +186,8 @@ def delete_upload(file_path: str) -> None:
         return
 
     if is_blob_url(file_path):
-        from vercel.blob import BlobClient
-
-        with BlobClient() as client:
-            client.delete([file_path])
+        # Queued and sent in batches by a background thread, so the request does not wait on Vercel.
+        blob_store.delete_later(file_path)
         return
 
     path = Path(file_path)
@@ -0,0 +1,174 @@
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+from backend.database.config import get_settings
+from backend.models.upload_session import UploadSession
+from backend.services.storage import StoredUpload, UploadTooLarge, save_upload, upload_limit_bytes
+
+
+class UploadSessionError(ValueError):
+    pass
+
+
+def _sessions_root() -> Path:
+    return Path(get_settings().upload_dir) / ".sessions"
+
+
+def _session_dir(session: UploadSession) -> Path:
+    return _sessions_root() / session.id
+
+
+def _chunk_path(session: UploadSession, index: int) -> Path:
+    return _session_dir(session) / f"{index:06d}.chunk"
+
+
+def expected_chunk_size(session: UploadSession, index: int) -> int:
+    if index < session.total_chunks - 1:
+        return session.chunk_size
+    return session.total_size - session.chunk_size * (session.total_chunks - 1)
+
+
+def prune_expired_sessions(db: Session) -> None:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=max(1, get_settings().upload_session_ttl_hours))
+    expired = db.query(UploadSession).filter(UploadSession.status == "open", UploadSession.updated_at < cutoff).all()
+    for session in expired:
+        shutil.rmtree(_session_dir(session), ignore_errors=True)
+        db.delete(session)
+    if expired:
+        db.commit()
+
+
+def create_upload_session(db: Session, user_id: int, file_name: str, total_size: int, content_type: str | None = None) -> UploadSession:
+    limit_bytes = upload_limit_bytes(resumable=True)
+    if total_size > limit_bytes:
+        raise UploadTooLarge(limit_bytes)
+
+    prune_expired_sessions(db)
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        filename=Path(file_name).name,
+        content_type=content_type,
+        total_size=total_size,
+        chunk_size=max(1, get_settings().upload_chunk_bytes),
+        status="open",
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    _session_dir(session).mkdir(parents=True, exist_ok=True)
+    return session
+
+
+def write_chunk(db: Session, session: UploadSession, index: int, data: bytes) -> None:
+    """Stage one chunk; re-sending a chunk replaces it, so clients can simply retry."""
+    if session.status != "open":
+        raise UploadSessionError("This upload is already complete")
+    if not 0 <= index < session.total_chunks:
+        raise UploadSessionError(f"Chunk index must be between 0 and {session.total_chunks - 1}")
+    expected = expected_chunk_size(session, index)
+    if len(data) != expected:
+        raise UploadSessionError(f"Chunk {index} must be exactly {expected} bytes, got {len(data)}")
+
+    target = _chunk_path(session, index)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # Written under a temporary name so an interrupted request never leaves a short chunk behind.
+    partial = target.with_suffix(".part")
+    partial.write_bytes(data)
+    partial.replace(target)
+
+    session.updated_at = datetime.now(timezone.utc)
+    db.commit()
+
+
+def _received_chunks(session: UploadSession) -> list[int]:
+    return [
+        index
+        for index in range(session.total_chunks)
+        if (path := _chunk_path(session, index)).exists() and path.stat().st_size == expected_chunk_size(session, index)
+    ]
+
+
+def session_status(session: UploadSession) -> dict:
+    received = set(_received_chunks(session)) if session.status == "open" else set(range(session.total_chunks))
+    contiguous = 0
+    while contiguous in received:
+        contiguous += 1
+    return {
+        "upload_id": session.id,
+        "filename": session.filename,
+        "status": session.status,
+        "total_size": session.total_size,
+        "chunk_size": session.chunk_size,
+        "total_chunks": session.total_chunks,
+        # Bytes received without gaps from the start of the file: where a sequential client resumes.
+        "offset": min(session.total_size, contiguous * session.chunk_size),
+        "received_bytes": sum(expected_chunk_size(session, index) for index in received),
+        "missing_chunks": [index for index in range(session.total_chunks) if index not in received],
+        "document_id": session.document_id,
+    }
+
+
+class _ChunkReader:
+    """Reads the staged chunks back as one file, one chunk file at a time."""
+
+    def __init__(self, paths: list[Path]) -> None:
+        self._paths = iter(paths)
+        self._handle = None
+
+    def read(self, size: int = -1) -> bytes:
+        while True:
+            if self._handle is None:
+                path = next(self._paths, None)
+                if path is None:
+                    return b""
+                self._handle = path.open("rb")
+            data = self._handle.read(size)
+            if data:
+                return data
+            self._handle.close()
+            self._handle = None
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+def assemble_upload_session(db: Session, session: UploadSession) -> StoredUpload:
+    """Stream the staged chunks, in order, through the normal storage path."""
+    if session.status != "open":
+        raise UploadSessionError("This upload is already complete")
+    missing = session_status(session)["missing_chunks"]
+    if missing:
+        raise UploadSessionError(f"Missing chunks: {', '.join(str(index) for index in missing[:20])}")
+
+    reader = _ChunkReader([_chunk_path(session, index) for index in range(session.total_chunks)])
+    try:
+        return save_upload(
+            db,
+            user_id=session.user_id,
+            file_name=session.filename,
+            source=reader,
+            content_type=session.content_type,
+            limit_bytes=upload_limit_bytes(resumable=True),
+        )
+    finally:
+        reader.close()
+
+
+def finish_upload_session(db: Session, session: UploadSession, document_id: int) -> None:
+    session.status = "completed"
+    session.document_id = document_id
+    db.commit()
+    shutil.rmtree(_session_dir(session), ignore_errors=True)
+
+
+def abort_upload_session(db: Session, session: UploadSession) -> None:
+    shutil.rmtree(_session_dir(session), ignore_errors=True)
+    db.delete(session)
+    db.commit()
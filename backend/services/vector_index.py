@@ -0,0 +1,159 @@
+import threading
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.ai.pipeline import ai_pipeline
+from backend.models.analysis import Analysis
+from backend.models.document import Document
+
+
+class _UserVectors:
+    """One user's document vectors as a preallocated float32 matrix; rows [0, size) are live."""
+
+    def __init__(self, dimension: int) -> None:
+        self.lock = threading.Lock()
+        self.matrix = np.zeros((16, dimension), dtype=np.float32)
+        self.ids = np.zeros(16, dtype=np.int64)
+        self.rows: dict[int, int] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.rows)
+
+    def fingerprint(self) -> tuple[int, int]:
+        return self.size, int(self.ids[: self.size].max()) if self.size else 0
+
+    def upsert(self, document_id: int, vector: np.ndarray) -> None:
+        row = self.rows.get(document_id)
+        if row is None:
+            row = self.size
+            if row == len(self.ids):
+                self.matrix = np.concatenate([self.matrix, np.zeros_like(self.matrix)])
+                self.ids = np.concatenate([self.ids, np.zeros_like(self.ids)])
+            self.rows[document_id] = row
+            self.ids[row] = document_id
+        self.matrix[row] = vector
+
+    def remove(self, document_id: int) -> None:
+        row = self.rows.pop(document_id, None)
+        if row is None:
+            return
+        last = self.size
+        if row != last:
+            # Move the last live row into the hole so the live block stays contiguous.
+            moved_id = int(self.ids[last])
+            self.matrix[row] = self.matrix[last]
+            self.ids[row] = moved_id
+            self.rows[moved_id] = row
+
+    def search(self, query: np.ndarray, k: int, exclude: int | None = None) -> list[tuple[int, float]]:
+        if not self.size:
+            return []
+        scores = self.matrix[: self.size] @ query
+        limit = min(k, self.size)
+        if exclude is not None and exclude in self.rows:
+            scores[self.rows[exclude]] = -np.inf
+            limit = min(k + 1, self.size)
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[row]), float(scores[row])) for row in top if np.isfinite(scores[row])][:k]
+
+
+class VectorIndex:
+    """Per-user in-memory cosine search over analyzed documents.
+
+    Each user's matrix is rebuilt lazily from Analysis.embeddings and kept current by
+    upsert/remove. A cheap (count, max id) check against the database catches changes
+    made by other processes, such as background workers.
+    """
+
+    def __init__(self) -> None:
+        self._users: dict[int, _UserVectors] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def dimension(self) -> int:
+        return ai_pipeline.embedder.dimension
+
+    def _database_fingerprint(self, db: Session, user_id: int) -> tuple[int, int]:
+        count, max_id = (
+            db.query(func.count(Analysis.id), func.max(Analysis.document_id))
+            .join(Document, Document.id == Analysis.document_id)
+            .filter(Document.user_id == user_id)
+            .one()
+        )
+        return int(count or 0), int(max_id or 0)
+
+    def _build(self, db: Session, user_id: int) -> _UserVectors:
+        vectors = _UserVectors(self.dimension)
+        rows = (
+            db.query(Analysis.document_id, Analysis.embeddings, Document.text)
+            .join(Document, Document.id == Analysis.document_id)
+            .filter(Document.user_id == user_id)
+            .all()
+        )
+        missing: list[tuple[int, str]] = []
+        for document_id, embeddings, text in rows:
+            if embeddings and len(embeddings) == self.dimension:
+                vectors.upsert(document_id, np.asarray(embeddings, dtype=np.float32))
+            else:
+                missing.append((document_id, text or ""))
+
+        # Analyses stored before embeddings existed (or with another dimension) are embedded in one batch.
+        if missing:
+            for (document_id, _), vector in zip(missing, ai_pipeline.embedder.embed_batch([text for _, text in missing])):
+                vectors.upsert(document_id, vector)
+        return vectors
+
+    def _vectors(self, db: Session, user_id: int) -> _UserVectors:
+        with self._lock:
+            vectors = self._users.get(user_id)
+        if vectors is not None:
+            with vectors.lock:
+                if vectors.fingerprint() == self._database_fingerprint(db, user_id):
+                    return vectors
+
+        vectors = self._build(db, user_id)
+        with self._lock:
+            self._users[user_id] = vectors
+        return vectors
+
+    def vector_for(self, db: Session, user_id: int, document_id: int) -> np.ndarray | None:
+        vectors = self._vectors(db, user_id)
+        with vectors.lock:
+            row = vectors.rows.get(document_id)
+            return None if row is None else vectors.matrix[row].copy()
+
+    def search(
+        self,
+        db: Session,
+        user_id: int,
+        query: np.ndarray,
+        k: int = 10,
+        exclude: int | None = None,
+    ) -> list[tuple[int, float]]:
+        vectors = self._vectors(db, user_id)
+        with vectors.lock:
+            return vectors.search(np.asarray(query, dtype=np.float32), k, exclude=exclude)
+
+    def upsert(self, user_id: int, document_id: int, embeddings: list[float]) -> None:
+        if len(embeddings) != self.dimension:
+            return
+        with self._lock:
+            vectors = self._users.get(user_id)
+        # Users without a loaded matrix pick the document up on their next lazy build.
+        if vectors is not None:
+            with vectors.lock:
+                vectors.upsert(document_id, np.asarray(embeddings, dtype=np.float32))
+
+    def remove(self, user_id: int, document_id: int) -> None:
+        with self._lock:
+            vectors = self._users.get(user_id)
+        if vectors is not None:
+            with vectors.lock:
+                vectors.remove(document_id)
+
+
+vector_index = VectorIndex()
@@ -0,0 +1,47 @@
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from backend.database.config import get_settings
+
+
+def _worker_process(worker_id: str) -> None:
+    from backend.services.jobs import run_worker
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    run_worker(worker_id, stop_event)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run Orbit Intel-AI analysis job workers.")
+    parser.add_argument("--processes", type=int, default=get_settings().analysis_worker_processes)
+    args = parser.parse_args()
+
+    # Spawn instead of fork so each worker builds its own database engine and HTTP pools.
+    context = multiprocessing.get_context("spawn")
+    host = socket.gethostname()
+    processes = [
+        context.Process(target=_worker_process, args=(f"{host}-{os.getpid()}-{index}",), name=f"analysis-worker-{index}")
+        for index in range(max(1, args.processes))
+    ]
+    for process in processes:
+        process.start()
+
+    def _shutdown(*_args) -> None:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()